@@ -0,0 +1,104 @@
+"""
+Offline crawler throughput benchmark built on recorded HTTP cassettes.
+
+Record a cassette against the live site (needs the Zyte proxy keys and certificate):
+    python benchmarks/crawler_throughput.py record ambervalley.gov.uk ambervalley.jsonl.gz --months-ago 1 --limit 50
+
+Replay it with no network access, simulating 200 ms per request:
+    python benchmarks/crawler_throughput.py replay ambervalley.gov.uk ambervalley.jsonl.gz --latency 0.2
+
+The replay exits with status 1 when --min-throughput is given and the crawl is slower than that.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+plugins_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins')
+sys.path.insert(0, plugins_dir)
+
+from scripts.downloader.cassette import RecordingDownloader, ReplayDownloader  # noqa: E402
+from scripts.file_handler.document_store import DocumentStore  # noqa: E402
+from scripts.utils.strategy_utils import get_crawling_strategy, get_downloader  # noqa: E402
+
+
+def get_sources_path(cassette_path: str) -> str:
+    return f'{cassette_path}.sources.json'
+
+
+def record(website_name: str, cassette_path: str, months_ago: int, limit: int):
+    downloader = RecordingDownloader(get_downloader(website_name), cassette_path)
+
+    # Documents already in a store are never downloaded, so recording starts from an empty one, as replay does,
+    # and every document the replay will ask for ends up in the cassette.
+    with tempfile.TemporaryDirectory() as document_dir:
+        crawler = get_crawling_strategy(website_name, downloader=downloader,
+                                        document_store=DocumentStore(document_dir))
+
+        sources = crawler.get_sources(months_ago=months_ago)[:limit]
+        with open(get_sources_path(cassette_path), 'w') as sources_file:
+            json.dump(sources, sources_file)
+
+        for source in sources:
+            crawler.crawl(source)
+
+    logging.info(f'Recorded {len(sources)} applications to {cassette_path}')
+
+
+def replay(website_name: str, cassette_path: str, latency: float, latency_jitter: float,
+           min_throughput: float = None) -> float:
+    with open(get_sources_path(cassette_path), 'r') as sources_file:
+        sources = json.load(sources_file)
+
+    downloader = ReplayDownloader(cassette_path, latency=latency, latency_jitter=latency_jitter)
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as document_dir:
+        crawler = get_crawling_strategy(website_name, downloader=downloader,
+                                        document_store=DocumentStore(document_dir))
+
+        start_time = time.monotonic()
+        for source in sources:
+            try:
+                crawler.crawl(source)
+            except Exception:
+                failures += 1
+        elapsed = time.monotonic() - start_time
+
+    throughput = len(sources) / elapsed if elapsed else float('inf')
+    downloader.metrics.log_summary()
+    print(f'{website_name}: {len(sources)} applications in {elapsed:.2f}s '
+          f'({throughput:.2f} applications/s, {failures} failed, latency {latency}s)')
+
+    if min_throughput and throughput < min_throughput:
+        print(f'Throughput below the {min_throughput} applications/s threshold')
+        sys.exit(1)
+
+    return throughput
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    argument_parser.add_argument('mode', choices=['record', 'replay'])
+    argument_parser.add_argument('website_name')
+    argument_parser.add_argument('cassette_path')
+    argument_parser.add_argument('--months-ago', type=int, default=1)
+    argument_parser.add_argument('--limit', type=int, default=50)
+    argument_parser.add_argument('--latency', type=float, default=0.0)
+    argument_parser.add_argument('--latency-jitter', type=float, default=0.0)
+    argument_parser.add_argument('--min-throughput', type=float, default=None)
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if arguments.mode == 'record':
+        record(arguments.website_name, arguments.cassette_path, arguments.months_ago, arguments.limit)
+    else:
+        replay(arguments.website_name, arguments.cassette_path, arguments.latency, arguments.latency_jitter,
+               arguments.min_throughput)
+
+
+if __name__ == '__main__':
+    main()
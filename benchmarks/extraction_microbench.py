@@ -0,0 +1,106 @@
+"""
+Micro-benchmarks for the fast HTML extraction in scripts/utils/bs4_utils.py, over the pages in a recorded cassette.
+
+Every HTML response in the cassette is run through the search result link, next page link and ASP.NET hidden
+input extraction, once with a full BeautifulSoup parse and once through the fast path, checking they agree:
+    python benchmarks/extraction_microbench.py wandsworth.jsonl.gz --repeat 20
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import timeit
+
+plugins_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins')
+sys.path.insert(0, plugins_dir)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from scripts.crawler.wandsworth_gov_uk import WandsworthGovUkCrawlingStrategy  # noqa: E402
+from scripts.downloader.cassette import Cassette  # noqa: E402
+from scripts.utils import bs4_utils  # noqa: E402
+
+
+def get_pages(cassette_path: str) -> list:
+    pages = []
+    for interactions in Cassette(cassette_path).interactions.values():
+        for interaction in interactions:
+            content_type = {key.lower(): value for key, value in interaction['headers'].items()}.get('content-type', '')
+            if 'pdf' in content_type:
+                continue
+
+            content = base64.b64decode(interaction['content'])
+            pages.append(content.decode(interaction['encoding'] or 'utf-8', errors='replace'))
+
+    return pages
+
+
+def full_soup_links(page: str) -> tuple:
+    soup = BeautifulSoup(page, 'lxml')
+    next_tags = soup.select('a.noborder:has(> img[title="Go to next page "])')
+
+    return ([tag['href'] for tag in soup.select('td.TableData a.data_text') if tag.has_attr('href')],
+            [tag['href'] for tag in next_tags if tag.has_attr('href')])
+
+
+def fast_links(page: str) -> tuple:
+    crawler = WandsworthGovUkCrawlingStrategy
+    return (bs4_utils.select_attribute_values(page, crawler.search_result_xpath, 'td.TableData a.data_text', 'href',
+                                              parse_only=crawler.search_results_strainer),
+            bs4_utils.select_attribute_values(page, crawler.next_page_xpath,
+                                              'a.noborder:has(> img[title="Go to next page "])', 'href',
+                                              parse_only=crawler.search_results_strainer))
+
+
+def strained_soup_links(page: str) -> tuple:
+    # The html.parser BeautifulSoup fallback of the fast path, timed by hiding lxml from bs4_utils.
+    lxml_html = bs4_utils.lxml_html
+    bs4_utils.lxml_html = None
+    try:
+        return fast_links(page)
+    finally:
+        bs4_utils.lxml_html = lxml_html
+
+
+def full_soup_inputs(page: str) -> dict:
+    soup = BeautifulSoup(page, 'lxml')
+    input_values = {}
+    for input_id in WandsworthGovUkCrawlingStrategy.aspnet_variable_ids:
+        tag = soup.select_one(f'input#{input_id}')
+        input_values[input_id] = tag.get('value') if tag else None
+
+    return input_values
+
+
+def fast_inputs(page: str) -> dict:
+    return bs4_utils.get_input_values(page, WandsworthGovUkCrawlingStrategy.aspnet_variable_ids)
+
+
+def time_per_page(function, pages: list, repeat: int) -> list:
+    return [min(timeit.repeat(lambda: function(page), number=1, repeat=repeat)) for page in pages]
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    argument_parser.add_argument('cassette_path')
+    argument_parser.add_argument('--repeat', type=int, default=10)
+    arguments = argument_parser.parse_args()
+
+    pages = get_pages(arguments.cassette_path)
+    mismatches = sum(full_soup_links(page) != fast_links(page) or full_soup_links(page) != strained_soup_links(page)
+                     or full_soup_inputs(page) != fast_inputs(page) for page in pages)
+
+    print(f'{len(pages)} recorded pages, {mismatches} with differing results')
+    for name, function in (('links, full soup', full_soup_links), ('links, strained soup', strained_soup_links),
+                           ('links, lxml xpath', fast_links), ('hidden inputs, full soup', full_soup_inputs),
+                           ('hidden inputs, lxml xpath', fast_inputs)):
+        times = time_per_page(function, pages, arguments.repeat)
+        print(f'  {name}: median {statistics.median(times) * 1000:.3f}ms, total {sum(times) * 1000:.1f}ms')
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Wandsworth parser benchmark on recorded pages.
+
+The applications in a cassette recorded with crawler_throughput.py are crawled offline, then the pages of every
+raw record are parsed --repeat times by parse() as it is in the working tree and as it was at --baseline-ref, the
+repository's first commit by default, which is read with git show:
+    python benchmarks/parser_throughput.py wandsworth.jsonl.gz --repeat 5 --baseline-ref <commit>
+
+Only the pages are parsed, without the application form, so document extraction does not hide the difference.
+The pages are given under both the current and the older record keys, so either parser finds them.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+plugins_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins')
+sys.path.insert(0, plugins_dir)
+
+from crawler_throughput import get_sources_path  # noqa: E402
+from scripts.downloader.cassette import ReplayDownloader  # noqa: E402
+from scripts.file_handler.document_store import DocumentStore  # noqa: E402
+from scripts.utils.strategy_utils import get_crawling_strategy, get_parsing_strategy  # noqa: E402
+
+website_name = 'planning.wandsworth.gov.uk'
+parser_path = 'plugins/scripts/parser/wandsworth_gov_uk.py'
+repository_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Record keys of each page, as the crawler stores them now and as older parsers read them.
+page_keys = {'main_page_data': 'main_details_data', 'dates_page_data': 'dates_data'}
+
+
+def get_raw_data_list(cassette_path: str, document_store: DocumentStore) -> list:
+    with open(get_sources_path(cassette_path), 'r') as sources_file:
+        sources = json.load(sources_file)
+
+    crawler = get_crawling_strategy(website_name, downloader=ReplayDownloader(cassette_path),
+                                    document_store=document_store)
+
+    return [raw_data for raw_data in crawler.crawl_batch(sources) if raw_data]
+
+
+def get_page_records(raw_data_list: list) -> list:
+    page_records = []
+    for raw_data in raw_data_list:
+        page_record = {'source': raw_data.get('source')}
+        for page_key, legacy_page_key in page_keys.items():
+            page_record[page_key] = page_record[legacy_page_key] = raw_data.get(page_key)
+        page_records.append(page_record)
+
+    return page_records
+
+
+def get_baseline_parser(baseline_ref: str):
+    """
+    :param baseline_ref: git revision to read the parser from, the first commit if None
+    :return: Returns an instance of the parser as it was at baseline_ref.
+    """
+    if baseline_ref is None:
+        baseline_ref = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=repository_dir,
+                                      capture_output=True, text=True, check=True).stdout.split()[0]
+
+    source = subprocess.run(['git', 'show', f'{baseline_ref}:{parser_path}'], cwd=repository_dir,
+                            capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType('baseline_wandsworth_gov_uk')
+    exec(compile(source, f'{baseline_ref}:{parser_path}', 'exec'), module.__dict__)
+
+    return module.WandsworthGovUkParsingStrategy()
+
+
+def time_parse(parser, records: list, repeat: int) -> list:
+    parse_times = []
+    for _ in range(repeat):
+        for record in records:
+            start_time = time.perf_counter()
+            parser.parse(record)
+            parse_times.append(time.perf_counter() - start_time)
+
+    return parse_times
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    argument_parser.add_argument('cassette_path')
+    argument_parser.add_argument('--repeat', type=int, default=3)
+    argument_parser.add_argument('--baseline-ref', default=None)
+    arguments = argument_parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as document_dir:
+        document_store = DocumentStore(document_dir)
+        page_records = get_page_records(get_raw_data_list(arguments.cassette_path, document_store))
+        parser = get_parsing_strategy(website_name, document_store=document_store)
+
+        baseline_times = time_parse(get_baseline_parser(arguments.baseline_ref), page_records, arguments.repeat)
+        current_times = time_parse(parser, page_records, arguments.repeat)
+
+    print(f'{website_name}: {len(page_records)} applications, {arguments.repeat} repeats')
+    for name, times in (('baseline parse() per application', baseline_times),
+                        ('current parse() per application', current_times)):
+        if times:
+            print(f'  {name}: median {statistics.median(times) * 1000:.2f}ms, max {max(times) * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
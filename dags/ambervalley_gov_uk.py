@@ -2,11 +2,14 @@ import logging
 from datetime import datetime
 
 from airflow.decorators import dag, task
+from airflow.operators.python import get_current_context
 from airflow.utils.dates import days_ago
 
-from scripts.utils.strategy_utils import get_parsing_strategy, get_crawling_strategy
-from scripts.file_handler.file_pickler import FilePickler
+from scripts.utils.strategy_utils import get_parsing_strategy, get_crawling_strategy, get_crawl_state, \
+    get_output_hook
+from scripts.file_handler.raw_data_store import RawDataStore
 from scripts.file_handler.csv_writer import CsvWriter
+from scripts.file_handler.parquet_writer import ParquetWriter
 
 default_args = {
     'owner': 'BCI Central'
@@ -16,9 +19,14 @@ months_ago = 6
 
 crawler = get_crawling_strategy(website_name=website_name)
 parser = get_parsing_strategy(website_name=website_name)
-file_handler = FilePickler()
+crawl_state = get_crawl_state(website_name=website_name)
+output_hook = get_output_hook(website_name=website_name)
+raw_data_store = RawDataStore()
 writer = CsvWriter()
+parquet_writer = ParquetWriter()
 date_today = datetime.now().strftime('%Y-%m-%d')
+parsed_data_name = f"{website_name.replace('.', '_')}_parsed_data_{date_today}"
+raw_data_name = f"{website_name.replace('.', '_')}_raw_data_{date_today}"
 
 
 @dag(default_args=default_args, start_date=days_ago(2), tags=['glenigan'])
@@ -26,33 +34,71 @@ def ambervalley_gov_uk():
     @task()
     def get_sources():
         application_sources = crawler.get_sources(months_ago=months_ago)
-        return application_sources
+        crawler.downloader.metrics.log_summary()
+        if crawl_state:
+            application_sources = crawl_state.filter_sources(application_sources)
+        return crawler.get_batches(application_sources)
 
     @task()
-    def crawl(reference_number: str) -> list:
-        raw_data = crawler.crawl(ref_val=reference_number)
-        return raw_data
+    def crawl(reference_numbers: list) -> list:
+        raw_data_list = crawler.crawl_batch(reference_numbers)
+        crawler.downloader.metrics.log_summary()
+        # Every mapped task writes its own shard of the run's raw data, keyed by source.
+        shard = f"{get_current_context()['ti'].map_index:05d}"
+        raw_data_store.dump(raw_data_list, raw_data_name, shard=shard, keys=reference_numbers)
+        if output_hook:
+            # Each task uploads the files it wrote, as mapped tasks may run on different workers.
+            for shard_path in raw_data_store.get_shard_paths(raw_data_name, shard):
+                output_hook.upload_output('raw', website_name, date_today, shard_path)
+        return raw_data_list
 
     @task()
-    def parse(raw_data: str) -> list:
-        processed_data = parser.parse(raw_data)
+    def parse(raw_data_list: list) -> list:
+        # Failed crawls stay as None so every batch lines up with its sources.
+        processed_data = parser.parse_many(raw_data_list)
         return processed_data
 
     @task()
-    def dump_raw_data(raw_data: list) -> list:
-        file_name = f"{website_name.replace('.', '_')}_raw_data_{date_today}"
-        file_handler.dump(raw_data, file_name)
+    def write_to_csv(data_batches: list) -> list:
+        data = (data for batch in data_batches for data in batch)
+        writer.write_stream(data, parsed_data_name, columns=parser.columns)
+        if output_hook:
+            output_hook.upload_output('csv', website_name, date_today,
+                                      f'{writer.output_file_path}/{parsed_data_name}.csv')
 
     @task()
-    def write_to_csv(data: list) -> list:
-        file_name = f"{website_name.replace('.', '_')}_parsed_data_{date_today}"
-        writer.write(data, file_name)
-
-    sources = get_sources()
-    raw_data_list = crawl.expand(reference_number=sources)
-    dump_raw_data(raw_data_list)
-    parsed_data = parse.expand(raw_data=raw_data_list)
-    write_to_csv(parsed_data)
+    def write_to_parquet(parsed_data_batches: list) -> int:
+        parsed_data = (parsed_data for batch in parsed_data_batches for parsed_data in batch)
+        record_count = parquet_writer.write_stream(parsed_data, website_name, date_today, parsed_data_name,
+                                                   columns=parser.columns, column_types=parser.column_types)
+        if output_hook and record_count:
+            output_hook.upload_output('parquet', website_name, date_today,
+                                      parquet_writer.get_file_path(website_name, date_today, parsed_data_name))
+        return record_count
+
+    @task(trigger_rule='all_done')
+    def update_crawl_state(source_batches: list):
+        if crawl_state:
+            ti = get_current_context()['ti']
+            fetched_data = []
+            complete = True
+            for map_index, sources in enumerate(source_batches):
+                # A batch whose crawl or parse failed has no parsed data, so its sources are left due.
+                parsed_data = ti.xcom_pull(task_ids='parse', map_indexes=map_index)
+                if parsed_data is None:
+                    complete = False
+                    continue
+
+                fetched_data.extend(zip(sources, parsed_data))
+
+            crawl_state.record(fetched_data, complete=complete)
+
+    source_batches = get_sources()
+    raw_data_batches = crawl.expand(reference_numbers=source_batches)
+    parsed_data_batches = parse.expand(raw_data_list=raw_data_batches)
+    write_to_csv(parsed_data_batches)
+    write_to_parquet(parsed_data_batches)
+    parsed_data_batches >> update_crawl_state(source_batches)
 
 
 ambervalley_dag = ambervalley_gov_uk()
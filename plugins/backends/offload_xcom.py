@@ -0,0 +1,88 @@
+import gzip
+import logging
+import os
+import uuid
+from types import SimpleNamespace
+
+from airflow.configuration import conf
+from airflow.models.xcom import BaseXCom
+
+try:
+    from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+except ImportError:
+    S3Hook = None
+
+plugins_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+default_path = os.path.join(plugins_dir, 'scripts/output/xcom')
+
+
+class OffloadXCom(BaseXCom):
+    """
+    XCom backend that keeps large values, such as batches of crawled pages, out of the metadata database. A value
+    serialized to more than [xcom_offload] threshold bytes is gzipped and written under [xcom_offload] path, a
+    local directory or an s3:// url, and the database only holds a reference to it. The value is read back when
+    a task pulls it, while the webserver's XCom listing only shows the reference.
+
+    Offloaded values are named after their task instance and key, so a retry overwrites its previous value.
+    They are not removed when XComs are cleared, which is left to the bucket's lifecycle rules or a cleanup job.
+    """
+    reference_prefix = 'xcom-offload://'
+
+    @staticmethod
+    def serialize_value(value, *, key=None, task_id=None, dag_id=None, run_id=None, map_index=None, **kwargs):
+        serialized_value = BaseXCom.serialize_value(value, key=key, task_id=task_id, dag_id=dag_id, run_id=run_id,
+                                                    map_index=map_index)
+        if len(serialized_value) <= conf.getint('xcom_offload', 'threshold', fallback=64 * 1024):
+            return serialized_value
+
+        if None in (dag_id, run_id, task_id, key):
+            object_name = f'{uuid.uuid4().hex}.gz'
+        else:
+            object_name = f'{dag_id}/{run_id}/{task_id}/{map_index if map_index is not None else -1}/{key}.gz'
+        location = OffloadXCom._write(object_name, gzip.compress(serialized_value))
+        logging.info(f'Offloaded {len(serialized_value)} byte XCom value to {location}')
+
+        return BaseXCom.serialize_value(f'{OffloadXCom.reference_prefix}{location}')
+
+    @staticmethod
+    def deserialize_value(result):
+        value = BaseXCom.deserialize_value(result)
+        if not isinstance(value, str) or not value.startswith(OffloadXCom.reference_prefix):
+            return value
+
+        serialized_value = gzip.decompress(OffloadXCom._read(value[len(OffloadXCom.reference_prefix):]))
+
+        # The offloaded value is decoded exactly as BaseXCom would have decoded it from the database.
+        return BaseXCom.deserialize_value(SimpleNamespace(value=serialized_value))
+
+    @staticmethod
+    def _write(object_name: str, data: bytes) -> str:
+        path = conf.get('xcom_offload', 'path', fallback=default_path).rstrip('/')
+        if path.startswith('s3://'):
+            location = f'{path}/{object_name}'
+            bucket_name, key = S3Hook.parse_s3_url(location)
+            OffloadXCom._get_hook().load_bytes(data, key, bucket_name=bucket_name, replace=True)
+        else:
+            location = os.path.join(path, object_name)
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            with open(f'{location}.tmp', 'wb') as value_file:
+                value_file.write(data)
+            os.replace(f'{location}.tmp', location)
+
+        return location
+
+    @staticmethod
+    def _read(location: str) -> bytes:
+        if location.startswith('s3://'):
+            bucket_name, key = S3Hook.parse_s3_url(location)
+            return OffloadXCom._get_hook().get_key(key, bucket_name=bucket_name).get()['Body'].read()
+
+        with open(location, 'rb') as value_file:
+            return value_file.read()
+
+    @staticmethod
+    def _get_hook():
+        if S3Hook is None:
+            raise Exception('OffloadXCom on S3 needs apache-airflow-providers-amazon')
+
+        return S3Hook(aws_conn_id=conf.get('xcom_offload', 'aws_conn_id', fallback='aws_default'))
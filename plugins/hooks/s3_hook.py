@@ -1,5 +1,89 @@
-from airflow.decorators import dag, task
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from airflow.providers.amazon.aws.hooks.s3 import S3Hook
 
-from datetime import datetime
-from airflow.utils.dates import days_ago
+
+class S3OutputHook(S3Hook):
+    """
+    Uploads a crawl's output to S3, so it outlives the worker that wrote it. Keys are partitioned as
+    <prefix>/<kind>/council=<website>/capture_date=<date>/<path>, where kind is e.g. raw, csv or parquet.
+
+    Files larger than multipart_threshold are uploaded in multipart_chunksize parts, max_concurrency at a time,
+    and the files of a directory are uploaded max_concurrent_uploads at a time. Each object carries the sha256 of
+    its content as metadata, so a file that is already uploaded unchanged is skipped. The endpoint comes from the
+    AWS connection, which can point at a local S3 stand-in such as moto's server for testing.
+    """
+    multipart_threshold = 16 * 1024 * 1024  # In bytes
+    multipart_chunksize = 16 * 1024 * 1024  # In bytes
+    max_concurrency = 8
+    max_concurrent_uploads = 4
+    checksum_metadata = 'sha256'
+
+    def __init__(self, bucket_name: str, prefix: str = 'output', aws_conn_id: str = 'aws_default', **kwargs):
+        kwargs.setdefault('transfer_config_args', dict(multipart_threshold=self.multipart_threshold,
+                                                       multipart_chunksize=self.multipart_chunksize,
+                                                       max_concurrency=self.max_concurrency))
+        super().__init__(aws_conn_id=aws_conn_id, **kwargs)
+        self.output_bucket_name = bucket_name
+        self.prefix = prefix.strip('/')
+
+    def get_output_key(self, kind: str, council: str, capture_date: str, path: str = '') -> str:
+        key = f'{self.prefix}/{kind}/council={council}/capture_date={capture_date}'
+
+        return f"{key}/{path.replace(os.sep, '/')}" if path else key
+
+    def upload_output(self, kind: str, council: str, capture_date: str, path: str) -> list:
+        """
+        :param kind: kind of output, the first part of the key after the prefix
+        :param council: website the output was crawled from
+        :param capture_date: date the output was crawled, as YYYY-MM-DD
+        :param path: file or directory to upload, a directory is uploaded with its layout below the partition
+        :return: Returns the keys uploaded, leaving out the unchanged ones that were skipped.
+        """
+        if os.path.isdir(path):
+            file_keys = {}
+            for directory, _, file_names in os.walk(path):
+                for file_name in file_names:
+                    if not file_name.endswith('.tmp'):
+                        file_path = os.path.join(directory, file_name)
+                        file_keys[file_path] = self.get_output_key(kind, council, capture_date,
+                                                                   os.path.relpath(file_path, path))
+        else:
+            file_keys = {path: self.get_output_key(kind, council, capture_date, os.path.basename(path))}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_uploads) as executor:
+            uploaded = list(executor.map(self.upload_if_changed, file_keys, file_keys.values()))
+
+        uploaded_keys = [key for key, is_uploaded in zip(file_keys.values(), uploaded) if is_uploaded]
+        logging.info(f'Uploaded {len(uploaded_keys)} of {len(file_keys)} {kind} files for {council} {capture_date}')
+
+        return uploaded_keys
+
+    def upload_if_changed(self, file_path: str, key: str) -> bool:
+        """
+        :return: Returns True if the file was uploaded, False if the object already has the same content.
+        """
+        sha256 = self._get_sha256(file_path)
+        head = self.head_object(key, bucket_name=self.output_bucket_name)
+        if head is not None and head.get('Metadata', {}).get(self.checksum_metadata) == sha256:
+            return False
+
+        # Managed transfers stream the file from disk, in parallel parts when it is over the threshold.
+        extra_args = self.extra_args
+        extra_args['Metadata'] = dict(extra_args.get('Metadata', {}), **{self.checksum_metadata: sha256})
+        self.get_conn().upload_file(file_path, self.output_bucket_name, key, ExtraArgs=extra_args,
+                                    Config=self.transfer_config)
+
+        return True
+
+    @staticmethod
+    def _get_sha256(file_path: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+
+        return file_hash.hexdigest()
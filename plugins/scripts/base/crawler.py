@@ -1,7 +1,17 @@
+import logging
+import re
 from abc import abstractmethod, ABC
+from concurrent.futures import ThreadPoolExecutor
 
 
 class CrawlingStrategy(ABC):
+    max_concurrent_downloads = 16
+    max_concurrent_crawls = 8
+    batch_size = 50
+    # Fields an application's documents are downloaded for, each with the names it may already be given under
+    # in the structured data, such as a details JSON. Empty means documents are always downloaded.
+    document_fields = {}
+
     @abstractmethod
     def download(self, url, timeout=10, headers=None, cookies=None, data=None):
         pass
@@ -9,3 +19,76 @@ class CrawlingStrategy(ABC):
     @abstractmethod
     def crawl(self):
         pass
+
+    def download_many(self, requests: list, max_workers: int = None) -> list:
+        """
+        :param requests: list of keyword argument dicts, each one passed to download()
+        :param max_workers: maximum number of downloads in flight, defaults to max_concurrent_downloads
+        :return: Returns the download() results in the same order as the requests.
+        """
+        if not requests:
+            return []
+
+        max_workers = min(max_workers or self.max_concurrent_downloads, len(requests))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda kwargs: self.download(**kwargs), requests))
+
+    def get_batches(self, sources: list, batch_size: int = None) -> list:
+        """
+        :param sources: sources returned by get_sources()
+        :param batch_size: maximum number of sources per batch, defaults to batch_size
+        :return: Returns the sources split into consecutive batches, one per crawl_batch() call.
+        """
+        batch_size = batch_size or self.batch_size
+
+        return [sources[index:index + batch_size] for index in range(0, len(sources), batch_size)]
+
+    def crawl_batch(self, sources: list, max_workers: int = None) -> list:
+        """
+        :param sources: sources to be passed one at a time to crawl()
+        :param max_workers: maximum number of applications crawled at once, defaults to max_concurrent_crawls
+        :return: Returns the crawl() results in the same order as the sources. A source that fails is logged
+        and left as None, so one bad application does not fail the rest of the batch.
+        """
+        if not sources:
+            return []
+
+        def crawl_source(source):
+            try:
+                return self.crawl(source)
+            except Exception as e:
+                logging.error(f'crawl_batch() error on {source}: {str(e)}')
+                return None
+
+        max_workers = min(max_workers or self.max_concurrent_crawls, len(sources))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            raw_data_list = list(executor.map(crawl_source, sources))
+
+        failed = sum(raw_data is None for raw_data in raw_data_list)
+        logging.info(f'Crawled {len(sources) - failed} of {len(sources)} applications in the batch')
+
+        return raw_data_list
+
+    def is_document_needed(self, structured_data: dict) -> bool:
+        """
+        :param structured_data: field names and values the crawler already has for the application
+        :return: Returns True unless every field in document_fields already has a value in structured_data.
+        """
+        if not self.document_fields:
+            return True
+
+        provided_fields = {self.normalize_field_name(name) for name, value in structured_data.items()
+                           if value not in (None, '') and str(value).strip()}
+        missing_fields = [field for field, names in self.document_fields.items()
+                          if not provided_fields.intersection(self.normalize_field_name(name) for name in names)]
+        if missing_fields:
+            logging.info(f'Document needed for {", ".join(missing_fields)}')
+
+        return bool(missing_fields)
+
+    @staticmethod
+    def normalize_field_name(name: str) -> str:
+        """
+        :return: Returns the name lower cased without separators, so "Easting (x)", "EastingX" and "easting_x" match.
+        """
+        return re.sub(r'[^a-z0-9]', '', name.lower())
@@ -1,3 +1,4 @@
+import copy
 from abc import abstractmethod, ABC
 
 
@@ -9,3 +10,32 @@ class DownloaderStrategy(ABC):
     @abstractmethod
     def post(self, url, timeout=10, headers=None, cookies=None, data=None):
         pass
+
+    def download_to_file(self, url, file, timeout=10, headers=None, cookies=None, content_type=None):
+        """
+        :param url: url of the document
+        :param file: writable binary file object the body is written to
+        :param content_type: if set, the body is only written when the Content-Type header contains it
+        :return: Returns the response, or None if the Content-Type did not match.
+        Downloaders that can stream should override this so the body is never held in memory.
+        """
+        response = self.get(url, timeout=timeout, headers=headers, cookies=cookies)
+        if content_type and content_type not in response.headers.get('Content-Type', ''):
+            return None
+
+        file.write(response.content)
+
+        return response
+
+    def new_session(self):
+        """
+        :return: Returns a downloader sharing this one's configuration but with its own cookies, for crawls that
+        depend on server side session state such as ASP.NET search results.
+        """
+        return copy.copy(self)
+
+    def close(self):
+        """
+        Releases the connections held by a downloader returned from new_session().
+        """
+        pass
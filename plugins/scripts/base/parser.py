@@ -1,7 +1,124 @@
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+_worker_parser = None
+
+
+def _init_worker(parser):
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_record_file(record_path: str):
+    # Runs in a pool worker, the record is read from disk so only its path crosses the process boundary.
+    with open(record_path, 'rb') as record_file:
+        record = pickle.load(record_file)
+
+    return _worker_parser.parse_isolated(record)
 
 
 class ParsingStrategy(ABC):
+    columns = ()  # Columns every parsed record is written with, in order. Records can carry more after them.
+    column_types = {}  # Python type of declared columns, for typed outputs. Columns without one are strings.
+    # Worker processes parse_many() uses by default. Mapped parse tasks share their worker's CPUs with other
+    # tasks, so records are parsed in process unless a site opts in with parse_workers in mapping.json.
+    parse_workers = 1
+
     @abstractmethod
     def parse(self, raw_data):
         pass
+
+    def parse_isolated(self, raw_data):
+        """
+        :return: Returns the parse() result, or None if raw_data is empty or could not be parsed.
+        """
+        if not raw_data:
+            return None
+
+        try:
+            return self.parse(raw_data)
+        except Exception as e:
+            logging.error(f'parse_isolated() error: {str(e)}')
+            return None
+
+    def parse_many(self, records: list, workers: int = None) -> list:
+        """
+        :param records: raw data records, as returned by the crawler
+        :param workers: number of worker processes, defaults to parse_workers
+        :return: Returns the parsed records in the same order as records. A record that fails to parse, or that
+        kills its worker, is logged and left as None.
+        Records are spooled to temporary files and workers are handed their paths, so large pages are not pickled
+        through the pool's pipes. The parser itself is sent once to each worker.
+        """
+        if not records:
+            return []
+
+        workers = min(workers or self.parse_workers, len(records))
+        if workers == 1 or multiprocessing.current_process().daemon:
+            # Daemonic processes, such as some executor workers, cannot start a pool of their own.
+            return [self.parse_isolated(record) for record in records]
+
+        parsed_records = [None] * len(records)
+        with tempfile.TemporaryDirectory() as spool_dir:
+            record_paths = {}
+            for index, record in enumerate(records):
+                if record:
+                    record_paths[index] = os.path.join(spool_dir, f'{index}.pkl')
+                    with open(record_paths[index], 'wb') as record_file:
+                        pickle.dump(record, record_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            broken_indexes = self._parse_record_files(record_paths, parsed_records, workers)
+            if broken_indexes:
+                # A worker died and took the pool down, so the unfinished records are retried one pool each to
+                # find the record responsible without losing the rest.
+                logging.warning(f'Worker process died, retrying {len(broken_indexes)} records one at a time')
+                for index in broken_indexes:
+                    self._parse_record_files({index: record_paths[index]}, parsed_records, 1)
+
+        return parsed_records
+
+    def parse_stream(self, records, workers: int = 1, chunk_size: int = 100):
+        """
+        :param records: iterable of raw data records, such as a generator reading them from disk
+        :param workers: number of worker processes, records are parsed in this process by default
+        :param chunk_size: number of records handed to parse_many() at a time when parsing with workers
+        :return: Returns a generator of the parsed records, in order, with None for each one that failed.
+        Records are only read from the iterable as they are parsed, so memory is bounded by one record, or by one
+        chunk with workers, rather than by the whole run.
+        """
+        if workers == 1:
+            for record in records:
+                yield self.parse_isolated(record)
+            return
+
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+
+            yield from self.parse_many(chunk, workers)
+
+    def _parse_record_files(self, record_paths: dict, parsed_records: list, workers: int) -> list:
+        broken_indexes = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            futures = {index: executor.submit(_parse_record_file, record_path)
+                       for index, record_path in record_paths.items()}
+            for index, future in futures.items():
+                try:
+                    parsed_records[index] = future.result()
+                except BrokenProcessPool as e:
+                    broken_indexes.append(index)
+                    if len(record_paths) == 1:
+                        logging.error(f'parse_many() error on record {index}: {str(e)}')
+                except Exception as e:
+                    logging.error(f'parse_many() error on record {index}: {str(e)}')
+
+        return broken_indexes
@@ -1,15 +1,31 @@
-import base64
 import logging
 import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
 from scripts.base.crawler import CrawlingStrategy
+from scripts.base.downloader import DownloaderStrategy
 from scripts.downloader.zyte_downloader import ZyteDownloader
+from scripts.file_handler.document_store import DocumentStore
 
 
 class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
-    def __init__(self):
-        self.downloader = ZyteDownloader(country='uk')
+    # The search times out on long date ranges, so sources are searched in windows of at most this many days.
+    # Windows that still fail, or come back this full and may have been truncated, are split in half.
+    max_window_days = 30
+    max_window_results = 1000
+    max_concurrent_searches = 6
+    search_timeout = 300  # In seconds
+    # The application form PDF is only streamed for these fields when GetPlanAppDetails does not provide them.
+    document_fields = {
+        'easting': ('Easting', 'Eastings'),
+        'northing': ('Northing', 'Northings'),
+        'planning_portal_reference': ('PlanningPortalReference', 'PlanningPortalRef', 'PPReference'),
+    }
+
+    def __init__(self, downloader: DownloaderStrategy = None, document_store: DocumentStore = None):
+        self.downloader = downloader if downloader is not None else ZyteDownloader(country='uk')
+        self.document_store = document_store if document_store is not None else DocumentStore()
         self.base_url = 'https://info.ambervalley.gov.uk/WebServices/AVBCFeeds'
         self.post_request_headers = {
             "Accept": "application/json, text/javascript, */*; q=0.01",
@@ -22,18 +38,19 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                           "(KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
         }
+        self.get_request_headers = {
+            "Host": "info.ambervalley.gov.uk",  # This is a required header
+            "Origin": "https://www.ambervalley.gov.uk",
+            "Referer": "https://www.ambervalley.gov.uk/",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+        }
 
-    def download(self, url, timeout=10000, headers=None, cookies=None, data=None, is_document=False):
+    def download(self, url, timeout=10000, headers=None, cookies=None, data=None):
         raw_data = None
 
         if not isinstance(headers, dict):
-            headers = {
-                "Host": "info.ambervalley.gov.uk",  # This is a required header
-                "Origin": "https://www.ambervalley.gov.uk",
-                "Referer": "https://www.ambervalley.gov.uk/",
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                              "(KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-            }
+            headers = self.get_request_headers
 
         try:
             if not data:
@@ -41,11 +58,7 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
             else:
                 response = self.downloader.post(url, timeout=timeout, headers=headers, cookies=cookies, data=data)
 
-            if is_document and response:
-                if 'application/pdf' in response.headers.get('Content-Type', ''):
-                    raw_data = response.content
-
-            elif not is_document and response:
+            if response:
                 raw_data = response.text
 
         except Exception as e:
@@ -55,29 +68,114 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
 
         return raw_data
 
+    def download_document(self, url, timeout=10000, headers=None, cookies=None) -> dict:
+        document = self.document_store.lookup(url)
+        if document:
+            logging.info(f'Document already stored from {url}')
+            return document
+
+        writer = self.document_store.writer()
+
+        if not isinstance(headers, dict):
+            headers = self.get_request_headers
+
+        try:
+            # The Content-Type is checked before the body is read, which is then streamed to the document store.
+            response = self.downloader.download_to_file(url, writer, timeout=timeout, headers=headers,
+                                                        cookies=cookies, content_type='application/pdf')
+            if response:
+                document = self.document_store.save(writer, source=url,
+                                                    content_type=response.headers.get('Content-Type'))
+
+        except Exception as e:
+            error_message = f'download_document() error: {str(e)}'
+            logging.error(error_message)
+            raise Exception(error_message)
+
+        finally:
+            if document is None:
+                self.document_store.discard(writer)
+
+        return document
+
     def get_sources(self, months_ago: int = 1) -> list:
         logging.info('Getting reference numbers...')
-        reference_numbers = []
         try:
-            date_start = datetime.now() - timedelta(days=30 * months_ago)
             date_end = datetime.now()
-            # If the months_ago value is greater than 4, we need to split the request into multiple requests
-            # because the server times out if the request is too long.
-            if months_ago > 4:
-                for i in range(0, months_ago, 4):
-                    date_start = date_start + timedelta(days=30 * i)
-                    date_end = date_start + timedelta(days=30 * (i + 4))
-                    reference_numbers.extend(self._get_reference_numbers(date_start, date_end))
-            else:
-                reference_numbers.extend(self._get_reference_numbers(date_start, date_end))
+            date_start = date_end - timedelta(days=30 * months_ago)
+            date_windows = self._get_date_windows(date_start, date_end)
+            reference_numbers = self._search_date_windows(date_windows)
 
         except Exception as e:
             error_message = f'get_sources() error: {str(e)}'
             logging.error(error_message)
             raise Exception(error_message)
 
+        logging.info(f'Found {len(reference_numbers)} unique reference numbers')
+
         return reference_numbers
 
+    def _get_date_windows(self, date_start: datetime, date_end: datetime) -> list:
+        """
+        :return: Returns consecutive, non-overlapping (start, end) windows covering date_start to date_end.
+        Both ends of a window are inclusive as the search works on whole days.
+        """
+        date_windows = []
+        window_start = date_start
+        while window_start <= date_end:
+            window_end = min(window_start + timedelta(days=self.max_window_days - 1), date_end)
+            date_windows.append((window_start, window_end))
+            window_start = window_end + timedelta(days=1)
+
+        return date_windows
+
+    @staticmethod
+    def _split_date_window(window_start: datetime, window_end: datetime) -> list:
+        window_days = (window_end.date() - window_start.date()).days + 1
+        if window_days < 2:
+            return []
+
+        first_half_end = window_start + timedelta(days=window_days // 2 - 1)
+
+        return [(window_start, first_half_end), (first_half_end + timedelta(days=1), window_end)]
+
+    def _search_date_windows(self, date_windows: list) -> list:
+        window_results = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_searches) as executor:
+            pending = {executor.submit(self._get_reference_numbers, *window): window for window in date_windows}
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = pending.pop(future)
+                    try:
+                        reference_numbers = future.result()
+                        needs_split = len(reference_numbers) >= self.max_window_results
+                        reason = f'{len(reference_numbers)} results'
+                    except Exception as e:
+                        reference_numbers = []
+                        needs_split = True
+                        reason = str(e)
+
+                    split_windows = self._split_date_window(*window) if needs_split else []
+                    if split_windows:
+                        logging.info(f'Splitting {window[0]:%d/%b/%Y} - {window[1]:%d/%b/%Y} ({reason})')
+                        for split_window in split_windows:
+                            pending[executor.submit(self._get_reference_numbers, *split_window)] = split_window
+                    elif needs_split:
+                        # A single day that fails, or may have been truncated, cannot be split any further.
+                        raise Exception(f'Search from {window[0]:%d/%b/%Y} to {window[1]:%d/%b/%Y} failed: {reason}')
+                    else:
+                        window_results[window] = reference_numbers
+
+        # Windows finish in any order, so merge them chronologically and keep the first of any duplicate refVal.
+        unique_reference_numbers = {}
+        for window in sorted(window_results):
+            for reference_number in window_results[window]:
+                unique_reference_numbers.setdefault(reference_number, None)
+
+        return list(unique_reference_numbers)
+
     def _get_reference_numbers(self, date_start: datetime, date_end: datetime) -> list:
         reference_numbers = []
         try:
@@ -89,7 +187,8 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
 
             form_data = f"keyWord=&fromDate={from_date}&toDate={to_date}"
             logging.info(f'Requesting data from {from_date} to {to_date} to {request_url}')
-            search_data = self.download(request_url, headers=self.post_request_headers, timeout=300000, data=form_data)
+            search_data = self.download(request_url, headers=self.post_request_headers, timeout=self.search_timeout,
+                                        data=form_data)
 
             if search_data:
                 json_data = json.loads(search_data)
@@ -110,9 +209,19 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
         raw_data = None
         try:
             logging.info(f'Getting data for reference number: {ref_val}')
+            # The details and the document list only need refVal, so they are requested side by side. The PDF
+            # itself waits for the details, as it is skipped when they already provide the document fields.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                details_future = executor.submit(self._get_planning_application_details, ref_val)
+                document_url_future = executor.submit(self._get_application_form_url, ref_val)
+
+                application_details = details_future.result()
+                document_url = document_url_future.result()
+
             planning_application_data = {
-                'application_details': self._get_planning_application_details(ref_val),
-                'application_form_document': self._get_planning_application_document(ref_val),
+                'application_details': application_details,
+                'application_form_document': self._get_planning_application_document(document_url,
+                                                                                     application_details),
                 'date_captured': datetime.now().strftime('%Y-%m-%dT%H%M%S')
             }
             raw_data = planning_application_data
@@ -141,8 +250,19 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
 
         return planning_application_details
 
-    def _get_planning_application_document(self, ref_val: str) -> dict:
-        planning_application_document = dict(data=None, source=None)
+    def _get_planning_application_document(self, document_url: str, application_details: dict) -> dict:
+        planning_application_document = dict(document=None, source=None)
+
+        if document_url and self.is_document_needed(application_details['data'] or {}):
+            document = self.download_document(document_url)
+            if document:
+                planning_application_document['document'] = document
+                planning_application_document['source'] = document_url
+
+        return planning_application_document
+
+    def _get_application_form_url(self, ref_val: str) -> str:
+        document_url = None
         request_path = '/IdoxEDMJSON.asmx/GetIdoxEDMDocListForCase'
         request_url = (f'{self.base_url}{request_path}?'
                        f'refVal={ref_val}&docApplication=planning')
@@ -162,15 +282,9 @@ class AmbervalleyGovUkCrawlingStrategy(CrawlingStrategy):
                     document_url = (f'{self.base_url}{document_request_path}?'
                                     f'docId={document_id}&docApplication=planning')
 
-                    document_data = self.download(document_url, is_document=True)
-                    if document_data:
-                        encoded_document = base64.b64encode(document_data).decode('utf-8')
-                        planning_application_document['data'] = encoded_document
-                        planning_application_document['source'] = document_url
-
             except json.decoder.JSONDecodeError as e:
-                logging.error(f'_get_planning_application_document() error: {str(e)}')
+                logging.error(f'_get_application_form_url() error: {str(e)}')
         else:
             logging.info('No document found for this planning application.')
 
-        return planning_application_document
+        return document_url
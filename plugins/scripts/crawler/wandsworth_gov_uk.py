@@ -1,18 +1,36 @@
+import copy
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, quote_plus
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from scripts.base.crawler import CrawlingStrategy
+from scripts.base.downloader import DownloaderStrategy
 from scripts.downloader.zyte_downloader import ZyteDownloader
-from scripts.utils.bs4_utils import clean_href, get_href
+from scripts.file_handler.document_store import DocumentStore
+from scripts.utils.bs4_utils import clean_href, get_class_xpath, get_href, get_input_values, \
+    select_attribute_values
 
 
 class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
-    def __init__(self):
-        self.downloader = ZyteDownloader(country='uk')
+    # The search is split into date shards of at most this many days, which are paged through concurrently.
+    shard_days = 30
+    max_concurrent_shards = 6
+    # Result pages are only searched for application links and the next page link, which are read with XPath.
+    # The BeautifulSoup fallback only parses the tags they live in.
+    search_result_xpath = f"//td[{get_class_xpath('TableData')}]//a[{get_class_xpath('data_text')}]/@href"
+    next_page_xpath = f"//a[{get_class_xpath('noborder')}][img[@title='Go to next page ']]/@href"
+    search_results_strainer = SoupStrainer(['td', 'a'], class_=re.compile(r'(^|\s)(TableData|noborder)(\s|$)'))
+    aspnet_variable_ids = ('__VIEWSTATE', '__VIEWSTATEGENERATOR', '__EVENTVALIDATION')
+    # No document_fields: the main page never shows the planning portal reference, so the application form is
+    # always needed.
+
+    def __init__(self, downloader: DownloaderStrategy = None, document_store: DocumentStore = None):
+        self.downloader = downloader if downloader is not None else ZyteDownloader(country='uk')
+        self.document_store = document_store if document_store is not None else DocumentStore()
         self.base_application_url = 'https://planning.wandsworth.gov.uk/Northgate/PlanningExplorer/Generic/'
         self.general_search_url = 'https://planning.wandsworth.gov.uk/Northgate/PlanningExplorer/GeneralSearch.aspx'
         self.post_request_headers = {
@@ -25,20 +43,21 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
             'Cache-Control': 'max-age=0',
             'Content-Type': 'application/x-www-form-urlencoded',
         }
+        self.get_request_headers = {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,'
+                      '*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Referer': 'https://www.wandsworth.gov.uk/',
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                          'Chrome/115.0.0.0 Safari/537.36',
+        }
 
-    def download(self, url, timeout=100, headers=None, cookies=None, data=None, is_document=False):
+    def download(self, url, timeout=100, headers=None, cookies=None, data=None):
         raw_data = None
 
         if not isinstance(headers, dict):
-            headers = {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,'
-                          '*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Referer': 'https://www.wandsworth.gov.uk/',
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
-                              'Chrome/115.0.0.0 Safari/537.36',
-            }
+            headers = self.get_request_headers
 
         try:
             if not data:
@@ -46,11 +65,7 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
             else:
                 response = self.downloader.post(url, timeout=timeout, headers=headers, cookies=cookies, data=data)
 
-            if is_document and response:
-                if 'application/pdf' in response.headers.get('Content-Type', ''):
-                    raw_data = response.content
-
-            elif not is_document and response:
+            if response:
                 raw_data = response.text
 
         except Exception as e:
@@ -58,38 +73,102 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
 
         return raw_data
 
+    def download_document(self, url, timeout=100, headers=None, cookies=None) -> dict:
+        document = self.document_store.lookup(url)
+        if document:
+            logging.info(f'Document already stored from {url}')
+            return document
+
+        writer = self.document_store.writer()
+
+        if not isinstance(headers, dict):
+            headers = self.get_request_headers
+
+        try:
+            # The Content-Type is checked before the body is read, which is then streamed to the document store.
+            response = self.downloader.download_to_file(url, writer, timeout=timeout, headers=headers,
+                                                        cookies=cookies, content_type='application/pdf')
+            if response:
+                document = self.document_store.save(writer, source=url,
+                                                    content_type=response.headers.get('Content-Type'))
+
+        except Exception as e:
+            logging.error(f'download_document() error: {str(e)}')
+
+        finally:
+            if document is None:
+                self.document_store.discard(writer)
+
+        return document
+
     def get_sources(self, months_ago: int = 6) -> list:
-        date_start = datetime.now() - timedelta(days=30 * months_ago)
         date_end = datetime.now()
+        date_start = date_end - timedelta(days=30 * months_ago)
 
-        viewstate = None
-        viewstate_generator = None
-        event_validation = None
+        try:
+            date_shards = self._get_date_shards(date_start, date_end)
+            logging.info(f'Searching {len(date_shards)} date shards...')
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_shards) as executor:
+                shard_sources = list(executor.map(lambda shard: self._get_shard_sources(*shard), date_shards))
+
+        except Exception as e:
+            error_message = f'get_sources() error: {str(e)}'
+            logging.error(error_message)
+            raise Exception(error_message)
+
+        # Shards are mapped in date order, keep the first of any application listed by more than one of them.
+        unique_sources = {}
+        for sources in shard_sources:
+            for source in sources:
+                unique_sources.setdefault(source, None)
+
+        logging.info(f'Found {len(unique_sources)} unique applications')
+
+        return list(unique_sources)
+
+    def _get_date_shards(self, date_start: datetime, date_end: datetime) -> list:
+        """
+        :return: Returns consecutive, non-overlapping (start, end) shards covering date_start to date_end.
+        Both ends of a shard are inclusive as the search works on whole days.
+        """
+        date_shards = []
+        shard_start = date_start
+        while shard_start <= date_end:
+            shard_end = min(shard_start + timedelta(days=self.shard_days - 1), date_end)
+            date_shards.append((shard_start, shard_end))
+            shard_start = shard_end + timedelta(days=1)
+
+        return date_shards
+
+    def _get_shard_sources(self, date_start: datetime, date_end: datetime) -> list:
+        """
+        :return: Returns the application sources of every search result page for date_start to date_end.
+        The search results are paged through the ASP.NET session state, so each shard runs its own search
+        on its own downloader session.
+        """
+        shard_crawler = copy.copy(self)
+        shard_crawler.downloader = self.downloader.new_session()
 
         try:
-            logging.info('Getting general search data...')
-            general_search_url_data = self.download(self.general_search_url)
-            if general_search_url_data:
-                general_search_url_soup = BeautifulSoup(general_search_url_data, 'lxml')
-                viewstate, viewstate_generator, event_validation = self._get_aspnet_variables(general_search_url_soup)
+            logging.info(f'Getting general search data for {date_start:%d/%m/%Y} - {date_end:%d/%m/%Y}...')
+            general_search_url_data = shard_crawler.download(self.general_search_url)
+            viewstate, viewstate_generator, event_validation = self._get_aspnet_variables(general_search_url_data)
 
             if all([viewstate, viewstate_generator, event_validation]): # Check if values are not None
                 logging.info('Getting first page data...')
                 first_page_form_data = self._get_first_page_form_data(viewstate, viewstate_generator, event_validation)
-                first_page_data = self._get_first_page_data(first_page_form_data, date_start, date_end)
+                first_page_data = shard_crawler._get_first_page_data(first_page_form_data, date_start, date_end)
             else:
                 raise Exception('Missing ASP.NET variables from general search URL '
                                 '(viewstate, viewstate_generator, or event_validation)')
 
             if first_page_data:
-                planning_application_sources = self._get_planning_application_sources(first_page_data)
+                planning_application_sources = shard_crawler._get_planning_application_sources(first_page_data)
             else:
                 raise Exception('Failed to get first page data')
 
-        except Exception as e:
-            error_message = f'get_sources() error: {str(e)}'
-            logging.error(error_message)
-            raise Exception(error_message)
+        finally:
+            shard_crawler.downloader.close()
 
         return planning_application_sources
 
@@ -135,9 +214,14 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
                 planning_application_data['main_page_data'] = main_page_data
                 main_page_soup = BeautifulSoup(main_page_data, 'lxml')
 
-                planning_application_data['dates_page_data'] = self._get_dates_page_data(main_page_soup)
-                document_urls, planning_application_data['application_form_document_data'] = \
-                    self._get_document_data(main_page_soup)
+                # The dates page and the document chain only depend on the main page, so they are fetched side by side.
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    dates_page_future = executor.submit(self._get_dates_page_data, main_page_soup)
+                    document_data_future = executor.submit(self._get_document_data, main_page_soup)
+
+                    planning_application_data['dates_page_data'] = dates_page_future.result()
+                    document_urls, planning_application_data['application_form_document_data'] = \
+                        document_data_future.result()
 
                 if document_urls:
                     planning_application_data.update(document_urls)
@@ -154,19 +238,17 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
     def _get_planning_application_sources(self, first_page_data: str) -> list:
         logging.info(f'Getting all planning application sources...')
 
-        first_page_soup = BeautifulSoup(first_page_data, 'lxml')
-        planning_application_sources = self._get_search_result_data(first_page_soup)
-        next_url = self._get_next_url(first_page_soup)
+        planning_application_sources = self._get_search_result_data(first_page_data)
+        next_url = self._get_next_url(first_page_data)
         current_page = 1
 
         while next_url:
             logging.info(f'On page {current_page}: {next_url}')
             page_data = self.download(next_url)
             if page_data:
-                page_soup = BeautifulSoup(page_data, 'lxml')
-                planning_application_sources.extend(self._get_search_result_data(page_soup))
+                planning_application_sources.extend(self._get_search_result_data(page_data))
 
-                next_url = self._get_next_url(page_soup)
+                next_url = self._get_next_url(page_data)
                 if not next_url:
                     logging.info(f'Next page not found')
                     break
@@ -177,24 +259,24 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
 
         return planning_application_sources
 
-    def _get_search_result_data(self, soup) -> list:
+    def _get_search_result_data(self, page_data: str) -> list:
         search_results = []
-        page_links = soup.select('td.TableData a.data_text')
+        page_hrefs = select_attribute_values(page_data, self.search_result_xpath, 'td.TableData a.data_text', 'href',
+                                             parse_only=self.search_results_strainer)
 
-        for link in page_links:
-            search_results.append(f'{self.base_application_url}{clean_href(link["href"])}')
+        for href in page_hrefs:
+            search_results.append(f'{self.base_application_url}{clean_href(href)}')
 
         return search_results
 
-    def _get_next_url(self, soup: BeautifulSoup) -> str:
+    def _get_next_url(self, page_data: str) -> str:
         next_url = None
-        next_url_tag = None
-        child_tag = soup.select_one('a.noborder img[title="Go to next page "]')
-        if child_tag:
-            next_url_tag = child_tag.parent
+        next_hrefs = select_attribute_values(page_data, self.next_page_xpath,
+                                             'a.noborder:has(> img[title="Go to next page "])', 'href',
+                                             parse_only=self.search_results_strainer)
 
-        if next_url_tag and next_url_tag.has_attr('href'):
-            next_url = f'{self.base_application_url}{clean_href(next_url_tag["href"])}'
+        if next_hrefs:
+            next_url = f'{self.base_application_url}{clean_href(next_hrefs[0])}'
 
         return next_url
 
@@ -216,13 +298,15 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
             if documents_page_data:
                 document_urls = self._get_document_urls(documents_page_data)
 
-        if document_urls and 'application_form_urls' in document_urls:
+        if document_urls and document_urls.get('application_form_urls'):
             application_form_urls = document_urls['application_form_urls']
-            for application_form in application_form_urls:
-                application_form_document_data = self.download(application_form, is_document=True)
-                if application_form_document_data and isinstance(application_form_document_data, bytes):
-                    # Take the first instance of returned data that is in bytes.
-                    break
+            with ThreadPoolExecutor(max_workers=min(len(application_form_urls), self.max_concurrent_downloads)) \
+                    as executor:
+                application_form_documents = list(executor.map(self.download_document, application_form_urls))
+
+            # Take the first candidate, in page order, that is actually a PDF.
+            application_form_document_data = next(
+                (document for document in application_form_documents if document), None)
         else:
             logging.info('No documents for this planning application')
 
@@ -235,7 +319,7 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
 
         soup = BeautifulSoup(page_data, 'lxml')
 
-        viewstate, viewstate_generator, event_validation = self._get_aspnet_variables(soup)
+        viewstate, viewstate_generator, event_validation = self._get_aspnet_variables(page_data)
         case_no_tag = soup.select_one('span#lblCaseNo')
         document_type_tags = soup.select('span[id*="lblChoice"]')
 
@@ -256,21 +340,22 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
             case_no = case_no_tag.get_text()
 
         if all([document_event_targets, case_no, viewstate, viewstate_generator, event_validation]):
-            for document_title, event_target in document_event_targets.items():
+            page_url = f'https://planning2.wandsworth.gov.uk/planningcase/comments.aspx?case={quote_plus(case_no)}'
+            headers = dict(self.post_request_headers, Origin='https://planning2.wandsworth.gov.uk', Referer=page_url)
+
+            postback_requests = []
+            for event_target in document_event_targets.values():
                 form_data = f'__EVENTTARGET={quote_plus(event_target)}' \
                             f'&__EVENTARGUMENT=' \
                             f'&__VIEWSTATE={quote_plus(viewstate)}' \
                             f'&__VIEWSTATEGENERATOR={quote_plus(viewstate_generator)}' \
                             f'&__SCROLLPOSITIONX=0&__SCROLLPOSITIONY=0' \
                             f'&__EVENTVALIDATION={quote_plus(event_validation)}'
+                postback_requests.append(dict(url=page_url, headers=headers, data=form_data))
 
-                page_url = f'https://planning2.wandsworth.gov.uk/planningcase/comments.aspx?case={quote_plus(case_no)}'
-
-                headers = self.post_request_headers
-                headers['Origin'] = 'https://planning2.wandsworth.gov.uk'
-                headers['Referer'] = page_url
-
-                post_page_data = self.download(page_url, headers=self.post_request_headers, data=form_data)
+            # Each postback replays the same viewstate, so the document types can be requested concurrently.
+            post_pages_data = self.download_many(postback_requests)
+            for document_title, post_page_data in zip(document_event_targets, post_pages_data):
                 if post_page_data:
                     post_page_soup = BeautifulSoup(post_page_data, 'lxml')
                     document_tags = post_page_soup.select('a[target="_blank"]')
@@ -279,27 +364,10 @@ class WandsworthGovUkCrawlingStrategy(CrawlingStrategy):
 
         return document_urls
 
-    @staticmethod
-    def _get_aspnet_variables(soup: BeautifulSoup) -> tuple:
-        viewstate = None
-        viewstate_generator = None
-        event_validation = None
-
-        if soup:
-            viewstate_tag = soup.select_one('input#__VIEWSTATE')
-            viewstate_generator_tag = soup.select_one('input#__VIEWSTATEGENERATOR')
-            event_validation_tag = soup.select_one('input#__EVENTVALIDATION')
-
-            if viewstate_tag and viewstate_tag.has_attr('value'):
-                viewstate = viewstate_tag['value']
-
-            if viewstate_generator_tag and viewstate_generator_tag.has_attr('value'):
-                viewstate_generator = viewstate_generator_tag['value']
-
-            if event_validation_tag and event_validation_tag.has_attr('value'):
-                event_validation = event_validation_tag['value']
+    def _get_aspnet_variables(self, page_data: str) -> tuple:
+        aspnet_variables = get_input_values(page_data, self.aspnet_variable_ids)
 
-        return viewstate, viewstate_generator, event_validation
+        return tuple(aspnet_variables[input_id] for input_id in self.aspnet_variable_ids)
 
     @staticmethod
     def _get_first_page_form_data(
@@ -0,0 +1,192 @@
+import asyncio
+import copy
+import logging
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from requests.exceptions import ConnectionError, ProxyError, Timeout
+
+from scripts.base.downloader import DownloaderStrategy
+from scripts.downloader.response import DownloadedResponse
+from scripts.downloader.metrics import RequestMetrics
+from scripts.downloader.rate_limiter import TokenBucketRateLimiter
+from scripts.downloader.retry_policy import RetryPolicy
+from scripts.downloader.zyte_downloader import ZyteDownloader
+
+
+class AsyncDownloader(DownloaderStrategy):
+    """
+    aiohttp based downloader. All requests run on a single background event loop that owns one
+    connection pool, so any number of callers (threads or coroutines) can share it while the number
+    of requests in flight per host stays bounded by max_per_host. Retries follow the shared RetryPolicy.
+    """
+    max_connections = 100
+    max_per_host = 10
+    chunk_size = 64 * 1024
+
+    def __init__(self, country=None, port='8011', use_proxy=True, max_per_host=None, max_connections=None,
+                 retry_policy: RetryPolicy = None, rate_limiter: TokenBucketRateLimiter = None,
+                 metrics: RequestMetrics = None):
+        self.max_per_host = max_per_host or self.max_per_host
+        self.max_connections = max_connections or self.max_connections
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self.proxy = None
+        self.ssl_context = False
+
+        if use_proxy:
+            self.ssl_context = ssl.create_default_context(cafile=ZyteDownloader.get_cert_path())
+            country_key = ZyteDownloader.get_country_key(country)
+            if country_key:
+                logging.info(f"Using proxy for {country_key}")
+                self.proxy = f"http://{country_key}:@proxy.zyte.com:{port}/"
+
+        self._session = None
+        self._is_session_copy = False
+        self._host_semaphores = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-downloader', daemon=True)
+        self._thread.start()
+        self._connector = self._run(self._create_connector())
+
+    def get(self, url, timeout=100, headers=None, cookies=None):
+        return self._run(self.aget(url, timeout=timeout, headers=headers, cookies=cookies))
+
+    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return self._run(self.apost(url, timeout=timeout, headers=headers, cookies=cookies, data=data))
+
+    async def aget(self, url, timeout=100, headers=None, cookies=None):
+        return await self._request('GET', url, timeout=timeout, headers=headers, cookies=cookies)
+
+    async def apost(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return await self._request('POST', url, timeout=timeout, headers=headers, cookies=cookies, data=data)
+
+    def download_to_file(self, url, file, timeout=100, headers=None, cookies=None, content_type=None):
+        return self._run(self.retry_policy.acall(url, self._send, 'GET', url, timeout=timeout, headers=headers,
+                                                 cookies=cookies, file=file, content_type=content_type,
+                                                 on_retry=self.metrics.record_retry))
+
+    def gather(self, requests: list) -> list:
+        """
+        :param requests: list of dicts with a url and optional method, timeout, headers, cookies and data keys
+        :return: Returns a response or the raised exception for each request, in the same order as the requests.
+        """
+        async def _gather():
+            coroutines = [self._request(request.get('method', 'GET'), request['url'],
+                                        timeout=request.get('timeout', 100),
+                                        headers=request.get('headers'),
+                                        cookies=request.get('cookies'),
+                                        data=request.get('data'))
+                          for request in requests]
+            return await asyncio.gather(*coroutines, return_exceptions=True)
+
+        return self._run(_gather())
+
+    def new_session(self):
+        # Sessions share the event loop, connection pool and per host limits, only the cookie jar is separate.
+        downloader = copy.copy(self)
+        downloader._session = None
+        downloader._is_session_copy = True
+
+        return downloader
+
+    def close(self):
+        if self._loop.is_running():
+            self._run(self._close_session())
+            if not self._is_session_copy:
+                self._run(self._connector.close())
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+
+    def _run(self, coroutine):
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('Blocking AsyncDownloader calls cannot be made from its own event loop, '
+                               'await aget()/apost() instead')
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _request(self, method, url, timeout=100, headers=None, cookies=None, data=None):
+        return await self.retry_policy.acall(url, self._send, method, url, timeout=timeout, headers=headers,
+                                             cookies=cookies, data=data, on_retry=self.metrics.record_retry)
+
+    async def _send(self, method, url, timeout=100, headers=None, cookies=None, data=None, file=None,
+                    content_type=None):
+        session = self._get_session()
+        if self.rate_limiter:
+            await self.rate_limiter.aacquire(url)
+
+        downloaded_response = None
+        size = 0
+        error = None
+        async with self._get_host_semaphore(url):
+            start_time = time.monotonic()
+            try:
+                async with session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                           headers=headers, cookies=cookies, data=data, proxy=self.proxy,
+                                           ssl=self.ssl_context) as response:
+                    downloaded_response = DownloadedResponse(str(response.url), response.status,
+                                                             headers=dict(response.headers),
+                                                             encoding=response.charset)
+                    downloaded_response.raise_for_status()
+
+                    if file is None:
+                        downloaded_response.content = await response.read()
+                        size = len(downloaded_response.content)
+                    elif content_type and content_type not in response.headers.get('Content-Type', ''):
+                        return None
+                    else:
+                        # Stream the body to the file so documents are never held in memory whole.
+                        file.seek(0)
+                        file.truncate()
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            file.write(chunk)
+                            size += len(chunk)
+
+            # Surface the same exception types as the requests based downloaders so the retry policy,
+            # the metrics and the crawlers treat every downloader alike.
+            except asyncio.TimeoutError as e:
+                error = Timeout(f'{method} {url} timed out')
+                raise error from e
+            except aiohttp.ClientProxyConnectionError as e:
+                error = ProxyError(f'{method} {url} failed to connect to the proxy: {str(e)}')
+                raise error from e
+            except aiohttp.ClientConnectionError as e:
+                error = ConnectionError(f'{method} {url} failed: {str(e)}')
+                raise error from e
+            except Exception as e:
+                error = e
+                raise
+
+            finally:
+                self.metrics.record(method, url, time.monotonic() - start_time, response=downloaded_response,
+                                    size=size, error=error)
+
+        return downloaded_response
+
+    async def _create_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only ever called on the event loop thread, so there is no race on creation.
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=self._connector, connector_owner=False)
+
+        return self._session
+
+    def _get_host_semaphore(self, url) -> asyncio.Semaphore:
+        # Requests through the proxy all share one proxy connection key, so the per host limit is
+        # enforced here on the target host rather than left to the connector.
+        host = urlsplit(url).hostname
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+
+        return self._host_semaphores[host]
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,200 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from scripts.base.downloader import DownloaderStrategy
+from scripts.downloader.response import DownloadedResponse
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_cache_dir = os.path.join(script_dir, '../output/http_cache')
+
+
+class CachedDownloader(DownloaderStrategy):
+    """
+    Wraps another downloader with an on-disk response cache. Entries younger than ttl are served directly,
+    older ones are revalidated with If-None-Match/If-Modified-Since when the server sent an ETag or
+    Last-Modified header. The cache is kept under max_size bytes by evicting the least recently used entries.
+    """
+    cacheable_methods = ('GET',)
+    lock_timeout = 30  # In seconds
+
+    def __init__(self, downloader: DownloaderStrategy, cache_dir: str = None, ttl: int = 43200,
+                 max_size: int = 2 * 1024 ** 3):
+        self.downloader = downloader
+        self.metrics = getattr(downloader, 'metrics', None)
+        self.cache_dir = cache_dir or default_cache_dir
+        self.bodies_dir = os.path.join(self.cache_dir, 'bodies')
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = dict(hits=0, misses=0, revalidated=0, stored=0, evicted=0)
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        connection = self._get_connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                           '(key TEXT PRIMARY KEY, url TEXT, method TEXT, status_code INTEGER, headers TEXT, '
+                           'encoding TEXT, etag TEXT, last_modified TEXT, size INTEGER, stored_at REAL, '
+                           'last_accessed REAL)')
+
+    def get(self, url, timeout=100, headers=None, cookies=None):
+        return self._request('GET', url, timeout=timeout, headers=headers, cookies=cookies)
+
+    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return self._request('POST', url, timeout=timeout, headers=headers, cookies=cookies, data=data)
+
+    def download_to_file(self, url, file, timeout=100, headers=None, cookies=None, content_type=None):
+        # Documents are streamed straight through, caching them here would load whole bodies into memory.
+        return self.downloader.download_to_file(url, file, timeout=timeout, headers=headers, cookies=cookies,
+                                                content_type=content_type)
+
+    def new_session(self):
+        # The cache itself is shared, only the wrapped downloader's cookies are separated.
+        downloader = copy.copy(self)
+        downloader.downloader = self.downloader.new_session()
+
+        return downloader
+
+    def close(self):
+        self.downloader.close()
+
+    def log_stats(self):
+        lookups = self.stats['hits'] + self.stats['revalidated'] + self.stats['misses']
+        hit_ratio = (self.stats['hits'] + self.stats['revalidated']) / lookups if lookups else 0.0
+        logging.info(f'HTTP cache stats: {json.dumps(self.stats)}, hit ratio {hit_ratio:.1%}')
+
+    @staticmethod
+    def get_cache_key(method: str, url: str, data=None) -> str:
+        key = f'{method.upper()} {url}'
+        if data:
+            key = f'{key} {data if isinstance(data, str) else json.dumps(data, sort_keys=True)}'
+
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _request(self, method, url, timeout=100, headers=None, cookies=None, data=None):
+        if method not in self.cacheable_methods:
+            return self._send(method, url, timeout=timeout, headers=headers, cookies=cookies, data=data)
+
+        key = self.get_cache_key(method, url, data)
+        entry = self._get_entry(key)
+
+        if entry and time.time() - entry['stored_at'] < self.ttl:
+            response = self._load_response(entry)
+            if response is not None:
+                self._increment('hits')
+                self._touch(key)
+                return response
+
+        request_headers = dict(headers or {})
+        if entry and entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self._send(method, url, timeout=timeout, headers=request_headers, cookies=cookies, data=data)
+
+        if entry and response is not None and response.status_code == 304:
+            cached_response = self._load_response(entry)
+            if cached_response is not None:
+                self._increment('revalidated')
+                self._touch(key, revalidated=True)
+                return cached_response
+
+            # The body was evicted from disk underneath the index, fetch it again unconditionally.
+            response = self._send(method, url, timeout=timeout, headers=headers, cookies=cookies, data=data)
+
+        self._increment('misses')
+        if response is not None and response.status_code == 200:
+            self._store(key, method, response)
+
+        return response
+
+    def _send(self, method, url, **kwargs):
+        if method == 'GET':
+            kwargs.pop('data', None)
+            return self.downloader.get(url, **kwargs)
+
+        return self.downloader.post(url, **kwargs)
+
+    def _get_entry(self, key: str) -> dict:
+        connection = self._get_connection()
+        cursor = connection.execute('SELECT * FROM entries WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def _load_response(self, entry: dict) -> DownloadedResponse:
+        try:
+            with open(os.path.join(self.bodies_dir, entry['key']), 'rb') as body_file:
+                content = body_file.read()
+        except FileNotFoundError:
+            return None
+
+        return DownloadedResponse(entry['url'], entry['status_code'], headers=json.loads(entry['headers']),
+                                  content=content, encoding=entry['encoding'])
+
+    def _store(self, key: str, method: str, response):
+        content = response.content
+        now = time.time()
+
+        # Write to a temporary name first so a concurrent reader never sees a partial body.
+        body_path = os.path.join(self.bodies_dir, key)
+        temporary_path = f'{body_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as body_file:
+            body_file.write(content)
+        os.replace(temporary_path, body_path)
+
+        connection = self._get_connection()
+        connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (key, response.url, method, response.status_code, json.dumps(dict(response.headers)),
+                            response.encoding, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                            len(content), now, now))
+        self._increment('stored')
+        self._evict()
+
+    def _touch(self, key: str, revalidated: bool = False):
+        now = time.time()
+        connection = self._get_connection()
+        if revalidated:
+            connection.execute('UPDATE entries SET stored_at = ?, last_accessed = ? WHERE key = ?', (now, now, key))
+        else:
+            connection.execute('UPDATE entries SET last_accessed = ? WHERE key = ?', (now, key))
+
+    def _evict(self):
+        connection = self._get_connection()
+        total_size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        for key, size in connection.execute('SELECT key, size FROM entries ORDER BY last_accessed').fetchall():
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            try:
+                os.remove(os.path.join(self.bodies_dir, key))
+            except FileNotFoundError:
+                pass
+
+            self._increment('evicted')
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def _increment(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads, keep one per thread.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), timeout=self.lock_timeout,
+                                         isolation_level=None)
+            self._local.connection = connection
+
+        return connection
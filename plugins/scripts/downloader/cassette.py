@@ -0,0 +1,211 @@
+import base64
+import copy
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+from requests.exceptions import ConnectionError, HTTPError
+
+from scripts.base.downloader import DownloaderStrategy
+from scripts.downloader.metrics import RequestMetrics
+from scripts.downloader.response import DownloadedResponse
+
+
+class Cassette:
+    """
+    Recorded request/response pairs, stored as gzip compressed JSON lines. Requests are matched on method,
+    url and a digest of the request body, so ASP.NET postbacks with different event targets stay apart.
+    Repeated requests are replayed in the order they were recorded.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            self.load()
+
+    @staticmethod
+    def get_key(method: str, url: str, data=None) -> str:
+        if data and not isinstance(data, (str, bytes)):
+            data = json.dumps(data, sort_keys=True)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        data_digest = hashlib.sha256(data).hexdigest() if data else ''
+
+        return f'{method.upper()} {url} {data_digest}'
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+            for line in cassette_file:
+                interaction = json.loads(line)
+                self.interactions.setdefault(interaction['key'], []).append(interaction)
+
+    def record(self, method: str, url: str, data, response, content: bytes):
+        interaction = {
+            'key': self.get_key(method, url, data),
+            'method': method,
+            'url': url,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'encoding': response.encoding,
+            'content': base64.b64encode(content or b'').decode('ascii'),
+        }
+
+        with self._lock:
+            self.interactions.setdefault(interaction['key'], []).append(interaction)
+            # Each append adds a gzip member, gzip readers treat concatenated members as one stream.
+            with gzip.open(self.path, 'at', encoding='utf-8') as cassette_file:
+                cassette_file.write(f'{json.dumps(interaction)}\n')
+
+    def play(self, method: str, url: str, data=None) -> DownloadedResponse:
+        """
+        :return: Returns the next recorded response for the request, the last one is repeated once they run out.
+        """
+        key = self.get_key(method, url, data)
+        with self._lock:
+            recorded_interactions = self.interactions.get(key)
+            if not recorded_interactions:
+                raise ConnectionError(f'No recorded response for {method} {url}')
+
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            interaction = recorded_interactions[min(cursor, len(recorded_interactions) - 1)]
+
+        return DownloadedResponse(interaction['url'], interaction['status_code'], headers=interaction['headers'],
+                                  content=base64.b64decode(interaction['content']),
+                                  encoding=interaction['encoding'])
+
+
+class _TeeWriter:
+    # Passes document chunks through to the real file while keeping a copy for the cassette.
+    def __init__(self, file):
+        self.file = file
+        self.buffer = io.BytesIO()
+
+    def write(self, chunk: bytes) -> int:
+        self.buffer.write(chunk)
+        return self.file.write(chunk)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        self.buffer.seek(offset, whence)
+        return self.file.seek(offset, whence)
+
+    def truncate(self, size: int = None) -> int:
+        self.buffer.truncate(size)
+        return self.file.truncate(size)
+
+
+class RecordingDownloader(DownloaderStrategy):
+    """
+    Wraps another downloader and records every response it returns, including error responses, to a cassette.
+    Crawlers skip documents already in their document store, so record with an empty store to capture them all.
+    """
+    def __init__(self, downloader: DownloaderStrategy, cassette_path: str):
+        self.downloader = downloader
+        self.metrics = getattr(downloader, 'metrics', None)
+        self.cassette = Cassette(cassette_path)
+
+    def get(self, url, timeout=100, headers=None, cookies=None):
+        return self._record('GET', url, None, self.downloader.get, url, timeout=timeout, headers=headers,
+                            cookies=cookies)
+
+    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return self._record('POST', url, data, self.downloader.post, url, timeout=timeout, headers=headers,
+                            cookies=cookies, data=data)
+
+    def download_to_file(self, url, file, timeout=100, headers=None, cookies=None, content_type=None):
+        tee_writer = _TeeWriter(file)
+        try:
+            response = self.downloader.download_to_file(url, tee_writer, timeout=timeout, headers=headers,
+                                                        cookies=cookies, content_type=content_type)
+        except HTTPError as e:
+            self._record_error('GET', url, None, e)
+            raise
+
+        if response is not None:
+            self.cassette.record('GET', url, None, response, tee_writer.buffer.getvalue())
+
+        return response
+
+    def new_session(self):
+        downloader = copy.copy(self)
+        downloader.downloader = self.downloader.new_session()
+
+        return downloader
+
+    def close(self):
+        self.downloader.close()
+
+    def _record(self, method, url, data, request_function, *args, **kwargs):
+        try:
+            response = request_function(*args, **kwargs)
+        except HTTPError as e:
+            self._record_error(method, url, data, e)
+            raise
+
+        if response is not None:
+            self.cassette.record(method, url, data, response, response.content)
+
+        return response
+
+    def _record_error(self, method, url, data, error: HTTPError):
+        if error.response is not None:
+            self.cassette.record(method, url, data, error.response, error.response.content)
+
+
+class ReplayDownloader(DownloaderStrategy):
+    """
+    Serves responses from a cassette without touching the network. latency (plus up to latency_jitter)
+    seconds are slept per request to simulate the live site.
+    """
+    def __init__(self, cassette_path: str, latency: float = 0.0, latency_jitter: float = 0.0,
+                 metrics: RequestMetrics = None):
+        self.cassette = Cassette(cassette_path)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+
+    def get(self, url, timeout=100, headers=None, cookies=None):
+        return self._play('GET', url)
+
+    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return self._play('POST', url, data)
+
+    def download_to_file(self, url, file, timeout=100, headers=None, cookies=None, content_type=None):
+        response = self._play('GET', url)
+        if content_type and content_type not in response.headers.get('Content-Type', ''):
+            return None
+
+        file.write(response.content)
+
+        return response
+
+    def _play(self, method, url, data=None) -> DownloadedResponse:
+        start_time = time.monotonic()
+        response = None
+        error = None
+        try:
+            delay = self.latency + random.uniform(0, self.latency_jitter)
+            if delay:
+                time.sleep(delay)
+
+            response = self.cassette.play(method, url, data)
+            response.raise_for_status()
+
+        except Exception as e:
+            error = e
+            raise
+
+        finally:
+            self.metrics.record(method, url, time.monotonic() - start_time, response=response,
+                                size=len(response.content) if response is not None else 0, error=error)
+
+        return response
@@ -0,0 +1,128 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+from requests.exceptions import ProxyError
+
+try:
+    from airflow.stats import Stats
+except ImportError:
+    Stats = None
+
+
+class RequestMetrics:
+    """
+    Per request metrics for a downloader. Every attempt is emitted to statsd through Airflow's Stats and
+    aggregated per host and endpoint, so log_summary() can write one structured summary per task.
+    """
+    stats_prefix = 'glenigan.downloader'
+    proxy_error_headers = ('X-Crawlera-Error', 'Zyte-Error')
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint(url: str) -> tuple:
+        """
+        :param url: request url
+        :return: Returns the host and the last path segment of the url, e.g. GetPlanAppDetails or comments.aspx.
+        """
+        url_parts = urlsplit(url)
+        endpoint = url_parts.path.rstrip('/').rsplit('/', 1)[-1] or '/'
+
+        return url_parts.hostname, endpoint
+
+    def record(self, method: str, url: str, latency: float, response=None, size: int = 0, error: Exception = None):
+        """
+        :param latency: seconds from sending the request until the body was read or the request failed
+        :param response: response of the attempt, if one was received
+        :param size: number of body bytes read
+        :param error: exception the attempt failed with, if any
+        """
+        host, endpoint = self.get_endpoint(url)
+        status_code = response.status_code if response is not None else None
+        is_proxy_error = isinstance(error, ProxyError) or (
+            response is not None and any(header in response.headers for header in self.proxy_error_headers))
+
+        with self._lock:
+            endpoint_metrics = self._get_endpoint_metrics(host, endpoint)
+            endpoint_metrics['requests'] += 1
+            endpoint_metrics['methods'][method] += 1
+            endpoint_metrics['latencies'].append(latency)
+            endpoint_metrics['bytes'] += size
+            if status_code:
+                endpoint_metrics['status_codes'][status_code] += 1
+            if error is not None:
+                endpoint_metrics['errors'][type(error).__name__] += 1
+            if is_proxy_error:
+                endpoint_metrics['proxy_errors'] += 1
+
+        if Stats:
+            stat_name = self._get_stat_name(host, endpoint)
+            Stats.timing(f'{stat_name}.latency', latency * 1000)
+            Stats.incr(f'{stat_name}.requests')
+            Stats.incr(f'{stat_name}.bytes', count=size)
+            if status_code:
+                Stats.incr(f'{stat_name}.status.{status_code}')
+            if error is not None:
+                Stats.incr(f'{stat_name}.errors.{type(error).__name__}')
+            if is_proxy_error:
+                Stats.incr(f'{stat_name}.proxy_errors')
+
+    def record_retry(self, url: str, attempt: int, error: Exception):
+        host, endpoint = self.get_endpoint(url)
+        with self._lock:
+            self._get_endpoint_metrics(host, endpoint)['retries'] += 1
+
+        if Stats:
+            Stats.incr(f'{self._get_stat_name(host, endpoint)}.retries')
+
+    def summary(self) -> dict:
+        summary = {}
+        with self._lock:
+            for (host, endpoint), endpoint_metrics in self.endpoints.items():
+                latencies = sorted(endpoint_metrics['latencies'])
+                summary.setdefault(host, {})[endpoint] = {
+                    'requests': endpoint_metrics['requests'],
+                    'methods': dict(endpoint_metrics['methods']),
+                    'retries': endpoint_metrics['retries'],
+                    'bytes': endpoint_metrics['bytes'],
+                    'status_codes': {str(code): count for code, count in endpoint_metrics['status_codes'].items()},
+                    'errors': dict(endpoint_metrics['errors']),
+                    'proxy_errors': endpoint_metrics['proxy_errors'],
+                    'latency_seconds': {
+                        'total': round(sum(latencies), 3),
+                        'p50': round(self._percentile(latencies, 0.5), 3),
+                        'p95': round(self._percentile(latencies, 0.95), 3),
+                        'max': round(latencies[-1], 3) if latencies else 0.0,
+                    },
+                }
+
+        return summary
+
+    def log_summary(self):
+        logging.info(f'Downloader metrics: {json.dumps(self.summary(), sort_keys=True)}')
+
+    def _get_endpoint_metrics(self, host: str, endpoint: str) -> dict:
+        key = (host, endpoint)
+        if key not in self.endpoints:
+            self.endpoints[key] = dict(requests=0, methods=Counter(), retries=0, bytes=0, latencies=[],
+                                       status_codes=Counter(), errors=Counter(), proxy_errors=0)
+
+        return self.endpoints[key]
+
+    def _get_stat_name(self, host: str, endpoint: str) -> str:
+        # statsd uses dots as separators, so they cannot appear inside a single name segment.
+        return f"{self.stats_prefix}.{re.sub(r'[^A-Za-z0-9_-]', '_', host or 'unknown')}." \
+               f"{re.sub(r'[^A-Za-z0-9_-]', '_', endpoint)}"
+
+    @staticmethod
+    def _percentile(values: list, percentile: float) -> float:
+        if not values:
+            return 0.0
+
+        return values[min(int(len(values) * percentile), len(values) - 1)]
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+default_db_path = os.path.join(tempfile.gettempdir(), 'glenigan_rate_limits.db')
+
+
+class TokenBucketRateLimiter:
+    """
+    Per host token bucket persisted in a SQLite file, so every mapped task running on the same worker
+    draws from the same bucket. Buckets refill at rate tokens per second up to capacity.
+    """
+    lock_timeout = 30  # In seconds
+
+    def __init__(self, rate: float, capacity: float = None, db_path: str = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(self.rate, 1.0)
+        self.db_path = db_path or default_db_path
+        self._local = threading.local()
+
+        connection = self._get_connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS buckets '
+                           '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+
+    def acquire(self, url: str):
+        key = urlsplit(url).hostname
+        wait = self.try_acquire(key)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.try_acquire(key)
+
+    async def aacquire(self, url: str):
+        key = urlsplit(url).hostname
+        # try_acquire() can block on the SQLite write lock, so it runs off the event loop.
+        loop = asyncio.get_running_loop()
+        wait = await loop.run_in_executor(None, self.try_acquire, key)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = await loop.run_in_executor(None, self.try_acquire, key)
+
+    def try_acquire(self, key: str, tokens: float = 1.0) -> float:
+        """
+        :param key: bucket to take the tokens from, usually the request host
+        :param tokens: number of tokens the request costs
+        :return: Returns 0 if the tokens were taken, otherwise the number of seconds until they are available.
+        """
+        connection = self._get_connection()
+        now = time.time()
+
+        # BEGIN IMMEDIATE takes the write lock up front so the read-modify-write is atomic across processes.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            if row:
+                available, updated_at = row
+                available = min(self.capacity, available + max(now - updated_at, 0.0) * self.rate)
+            else:
+                available = self.capacity
+
+            if available >= tokens:
+                available -= tokens
+                wait = 0.0
+            else:
+                wait = (tokens - available) / self.rate
+
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                               (key, available, now))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        return wait
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads, keep one per thread.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=self.lock_timeout, isolation_level=None)
+            self._local.connection = connection
+
+        return connection
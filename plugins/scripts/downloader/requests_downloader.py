@@ -0,0 +1,105 @@
+import copy
+import time
+
+import requests
+
+import urllib3
+
+from scripts.base.downloader import DownloaderStrategy
+from scripts.downloader.metrics import RequestMetrics
+from scripts.downloader.rate_limiter import TokenBucketRateLimiter
+from scripts.downloader.retry_policy import RetryPolicy
+
+urllib3.disable_warnings()
+
+
+class RequestsDownloader(DownloaderStrategy):
+    """
+    Downloader over a pooled requests session, with retries, rate limiting, metrics and documents streamed to
+    file. Subclasses only set up their session, such as a proxy or certificate, in _configure_session().
+    """
+    chunk_size = 64 * 1024
+    # Crawls fetch several resources per application from a few threads at once, all over one session.
+    pool_maxsize = 32
+
+    def __init__(self, retry_policy: RetryPolicy = None, rate_limiter: TokenBucketRateLimiter = None,
+                 metrics: RequestMetrics = None):
+        self.requester = self._create_session()
+        self._configure_session(self.requester)
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+
+    def get(self, url, timeout=100, headers=None, cookies=None):
+        return self.retry_policy.call(url, self._send, 'GET', url, timeout=timeout, headers=headers,
+                                      cookies=cookies, on_retry=self.metrics.record_retry)
+
+    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
+        return self.retry_policy.call(url, self._send, 'POST', url, timeout=timeout, headers=headers,
+                                      cookies=cookies, data=data, on_retry=self.metrics.record_retry)
+
+    def download_to_file(self, url, file, timeout=100, headers=None, cookies=None, content_type=None):
+        return self.retry_policy.call(url, self._send, 'GET', url, file=file, content_type=content_type,
+                                      timeout=timeout, headers=headers, cookies=cookies,
+                                      on_retry=self.metrics.record_retry)
+
+    def new_session(self):
+        downloader = copy.copy(self)
+        downloader.requester = self._create_session()
+        downloader.requester.verify = self.requester.verify
+        downloader.requester.proxies = self.requester.proxies
+
+        return downloader
+
+    def close(self):
+        self.requester.close()
+
+    def _configure_session(self, session: requests.Session):
+        """
+        Sets up the downloader's first session. Sessions from new_session() copy its verify and proxies settings.
+        """
+        pass
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_maxsize, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def _send(self, method, url, file=None, content_type=None, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire(url)
+
+        response = None
+        size = 0
+        error = None
+        start_time = time.monotonic()
+        try:
+            response = self.requester.request(method, url, stream=file is not None, **kwargs)
+            with response:
+                response.raise_for_status()
+
+                if file is None:
+                    size = len(response.content)
+                else:
+                    # Only the headers have been read at this point, the body is streamed to the file in chunks.
+                    if content_type and content_type not in response.headers.get('Content-Type', ''):
+                        return None
+
+                    file.seek(0)
+                    file.truncate()
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        file.write(chunk)
+                        size += len(chunk)
+
+        except Exception as e:
+            error = e
+            raise
+
+        finally:
+            self.metrics.record(method, url, time.monotonic() - start_time, response=response, size=size,
+                                error=error)
+
+        return response
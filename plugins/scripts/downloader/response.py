@@ -0,0 +1,35 @@
+import json
+
+from requests.exceptions import HTTPError
+from requests.structures import CaseInsensitiveDict
+
+
+class DownloadedResponse:
+    """
+    Lightweight, fully-read response used by downloaders that do not hand back a requests.Response.
+    Exposes the subset of the requests.Response interface the crawlers rely on.
+    """
+    def __init__(self, url: str, status_code: int, headers=None, content: bytes = b'', encoding: str = None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.encoding = encoding
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(f'{self.status_code} Error for url: {self.url}', response=self)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from requests.exceptions import ConnectionError, HTTPError, RequestException, Timeout
+
+
+class CircuitOpenError(RequestException):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Per host circuit breaker. After failure_threshold consecutive failures the circuit opens and requests
+    fail fast until reset_timeout has passed, after which a single trial request is let through.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failure_count = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f'Circuit for {self.host} is open, failing fast')
+
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f'Circuit for {self.host} is half open, trial request in flight')
+
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failure_count = 0
+            self._trial_in_flight = False
+
+    def record_ignored(self):
+        """
+        For requests that failed for reasons unrelated to the host's health, such as a 404. The state and failure
+        count are left as they are, only a half open trial is released so another request can be let through.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failure_count += 1
+            if self.state == self.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f'Opening circuit for {self.host} after {self.failure_count} failures')
+
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url: str, failure_threshold: int = 5, reset_timeout: float = 60.0) -> CircuitBreaker:
+    """
+    :param url: url of the request, circuit breakers are shared by every request to the same host
+    :return: Returns the process wide circuit breaker for the url's host.
+    """
+    host = urlsplit(url).hostname
+    with _circuit_breakers_lock:
+        if host not in _circuit_breakers:
+            _circuit_breakers[host] = CircuitBreaker(host, failure_threshold, reset_timeout)
+
+    return _circuit_breakers[host]
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter. Connection errors, timeouts and retryable status codes are
+    retried, a Retry-After header on a 429/503 response takes precedence over the computed backoff.
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+    retry_exceptions = (ConnectionError, Timeout)
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 30.0,
+                 max_retry_after: float = 120.0, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def call(self, url: str, function, *args, on_retry=None, **kwargs):
+        circuit_breaker = get_circuit_breaker(url, self.failure_threshold, self.reset_timeout)
+        attempt = 1
+        while True:
+            circuit_breaker.before_request()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                delay = self._handle_failure(circuit_breaker, url, attempt, e, on_retry)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            circuit_breaker.record_success()
+            return result
+
+    async def acall(self, url: str, function, *args, on_retry=None, **kwargs):
+        circuit_breaker = get_circuit_breaker(url, self.failure_threshold, self.reset_timeout)
+        attempt = 1
+        while True:
+            circuit_breaker.before_request()
+            try:
+                result = await function(*args, **kwargs)
+            except Exception as e:
+                delay = self._handle_failure(circuit_breaker, url, attempt, e, on_retry)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            circuit_breaker.record_success()
+            return result
+
+    def is_retryable(self, exception: Exception) -> bool:
+        if isinstance(exception, HTTPError):
+            response = exception.response
+            return response is not None and response.status_code in self.retry_statuses
+
+        return isinstance(exception, self.retry_exceptions)
+
+    def get_delay(self, attempt: int, response=None) -> float:
+        retry_after = self.get_retry_after(response)
+        if retry_after is not None:
+            return retry_after
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def get_retry_after(response) -> float:
+        """
+        :param response: response of the failed request, if any
+        :return: Returns the Retry-After delay in seconds, or None if the response has no usable header.
+        """
+        retry_after = None
+        if response is not None and response.status_code in (429, 503):
+            header_value = response.headers.get('Retry-After')
+            if header_value:
+                try:
+                    retry_after = float(header_value)
+                except ValueError:
+                    try:
+                        retry_at = parsedate_to_datetime(header_value)
+                        retry_after = (retry_at - datetime.now(timezone.utc)).total_seconds()
+                    except (TypeError, ValueError):
+                        retry_after = None
+
+        return max(retry_after, 0.0) if retry_after is not None else None
+
+    def _handle_failure(self, circuit_breaker: CircuitBreaker, url: str, attempt: int, exception: Exception,
+                        on_retry=None) -> float:
+        if not self.is_retryable(exception):
+            # Rejected requests and local errors say nothing about the host being up or down.
+            circuit_breaker.record_ignored()
+            raise exception
+
+        circuit_breaker.record_failure()
+        if attempt >= self.max_attempts:
+            raise exception
+
+        delay = self.get_delay(attempt, getattr(exception, 'response', None))
+        if delay > self.max_retry_after:
+            logging.warning(f'{url} asked to retry after {delay:.0f}s, giving up instead')
+            raise exception
+
+        logging.warning(f'{url} attempt {attempt} failed, retrying in {delay:.1f}s: {str(exception)}')
+        if on_retry:
+            on_retry(url, attempt, exception)
+
+        return delay
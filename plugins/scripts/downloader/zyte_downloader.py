@@ -1,56 +1,30 @@
 import json
 import logging
 import os
-import requests
-from requests.exceptions import HTTPError, ConnectionError
 
-import urllib3
-from retrying import retry
+from scripts.downloader.metrics import RequestMetrics
+from scripts.downloader.rate_limiter import TokenBucketRateLimiter
+from scripts.downloader.requests_downloader import RequestsDownloader
+from scripts.downloader.retry_policy import RetryPolicy
 
-from scripts.base.downloader import DownloaderStrategy
 
-urllib3.disable_warnings()
+class ZyteDownloader(RequestsDownloader):
+    def __init__(self, country=None, port='8011', retry_policy: RetryPolicy = None,
+                 rate_limiter: TokenBucketRateLimiter = None, metrics: RequestMetrics = None):
+        self.country = country
+        self.port = port
+        super().__init__(retry_policy=retry_policy, rate_limiter=rate_limiter, metrics=metrics)
 
-
-class ZyteDownloader(DownloaderStrategy):
-    max_retries = 5
-    retry_delay = 5000 # In milliseconds
-
-    def __init__(self, country=None, port='8011'):
-        self.requester = requests.Session()
-        self.requester.verify = self.get_cert_path()
-        country_key = self.get_country_key(country)
+    def _configure_session(self, session):
+        session.verify = self.get_cert_path()
+        country_key = self.get_country_key(self.country)
         if country_key:
             logging.info(f"Using proxy for {country_key}")
-            self.requester.proxies = {
-                "http": f"http://{country_key}:@proxy.zyte.com:{port}/",
-                "https": f"http://{country_key}:@proxy.zyte.com:{port}/",
+            session.proxies = {
+                "http": f"http://{country_key}:@proxy.zyte.com:{self.port}/",
+                "https": f"http://{country_key}:@proxy.zyte.com:{self.port}/",
             }
 
-    @retry(stop_max_attempt_number=max_retries, wait_fixed=retry_delay, retry_on_exception=ConnectionError)
-    def get(self, url, timeout=100, headers=None, cookies=None):
-        try:
-            response = self.requester.get(url, timeout=timeout, headers=headers, cookies=cookies)
-            response.raise_for_status()
-
-            return response
-        except ConnectionError:
-            raise ConnectionError
-        except HTTPError:
-            raise HTTPError
-
-    @retry(stop_max_attempt_number=max_retries, wait_fixed=retry_delay)
-    def post(self, url, timeout=100, headers=None, cookies=None, data=None):
-        try:
-            response = self.requester.post(url, timeout=timeout, headers=headers, cookies=cookies, data=data)
-            response.raise_for_status()
-
-            return response
-        except ConnectionError:
-            raise ConnectionError
-        except HTTPError:
-            raise HTTPError
-
     @staticmethod
     def get_country_key(country=None):
         logging.info('Getting country key')
@@ -0,0 +1,163 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+try:
+    from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+except ImportError:
+    S3Hook = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_state_dir = os.path.join(script_dir, '../output/crawl_state')
+
+
+class CrawlState:
+    """
+    Remembers every application source a website's crawl has fetched, when it was last fetched and a
+    fingerprint of its parsed data, so the next run only crawls new applications and ones that may have changed.
+
+    An application is due again recrawl_days after it was fetched. Each fetch that finds it unchanged doubles
+    that interval, up to max_recrawl_days, and any change resets it. Every full_refresh_days all sources are
+    crawled regardless, and the refresh only counts once record() is told the whole run succeeded. With an
+    s3_bucket the database is pulled from, and pushed back to, s3_key.
+    """
+    day = 24 * 60 * 60  # In seconds
+    lock_timeout = 30  # In seconds
+    excluded_fields = ('date_captured',)
+
+    def __init__(self, website_name: str, db_path: str = None, full_refresh_days: int = 7, recrawl_days: int = 1,
+                 max_recrawl_days: int = 28, s3_bucket: str = None, s3_key: str = None,
+                 aws_conn_id: str = 'aws_default'):
+        self.website_name = website_name
+        self.db_path = db_path or os.path.join(default_state_dir, f"{website_name.replace('.', '_')}.db")
+        self.full_refresh_days = full_refresh_days
+        self.recrawl_days = recrawl_days
+        self.max_recrawl_days = max_recrawl_days
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key or f'crawl_state/{os.path.basename(self.db_path)}'
+        self.aws_conn_id = aws_conn_id
+
+        if self.s3_bucket and S3Hook is None:
+            raise Exception('CrawlState S3 sync needs apache-airflow-providers-amazon')
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+    def filter_sources(self, sources: list) -> list:
+        """
+        :param sources: every source found by the crawler's get_sources()
+        :return: Returns the sources that are new or due a recrawl, in their original order, or all of them
+        when a full refresh is due.
+        """
+        self.pull()
+        now = time.time()
+
+        with self._connect() as connection:
+            row = connection.execute('SELECT last_full_refresh FROM refreshes WHERE website = ?',
+                                     (self.website_name,)).fetchone()
+            if row is None or now - row[0] >= self.full_refresh_days * self.day:
+                logging.info(f'Full refresh due, crawling all {len(sources)} sources')
+                # The refresh is only pending until record() knows the run succeeded, so a failed one is retried.
+                connection.execute('INSERT OR REPLACE INTO pending_refreshes VALUES (?, ?)', (self.website_name, now))
+                due_sources = list(sources)
+            else:
+                connection.execute('DELETE FROM pending_refreshes WHERE website = ?', (self.website_name,))
+                fetched = {source: (last_fetched, unchanged_count) for source, last_fetched, unchanged_count in
+                           connection.execute('SELECT source, last_fetched, unchanged_count FROM applications')}
+                due_sources = [source for source in sources
+                               if source not in fetched or now - fetched[source][0] >= self.get_recrawl_interval(
+                                   fetched[source][1])]
+
+        self.push()
+        logging.info(f'{len(due_sources)} of {len(sources)} sources are new or due a recrawl')
+
+        return due_sources
+
+    def record(self, fetched_data: list, complete: bool = True):
+        """
+        :param fetched_data: list of (source, parsed data) pairs for the applications crawled in this run
+        :param complete: whether every batch of the run was crawled and parsed. A pending full refresh is only
+        recorded for a complete run, otherwise the next run is a full refresh again.
+        """
+        self.pull()
+        now = time.time()
+        changed = 0
+
+        with self._connect() as connection:
+            for source, data in fetched_data:
+                if not data:
+                    # Failed crawls are left due, so they are retried on the next run.
+                    continue
+
+                fingerprint = self.get_fingerprint(data)
+                row = connection.execute('SELECT fingerprint, unchanged_count FROM applications WHERE source = ?',
+                                         (source,)).fetchone()
+                if row is None:
+                    connection.execute('INSERT INTO applications VALUES (?, ?, ?, ?, ?, ?)',
+                                       (source, fingerprint, now, now, now, 0))
+                    changed += 1
+                elif row[0] == fingerprint:
+                    connection.execute('UPDATE applications SET last_fetched = ?, unchanged_count = ? '
+                                       'WHERE source = ?', (now, row[1] + 1, source))
+                else:
+                    connection.execute('UPDATE applications SET fingerprint = ?, last_fetched = ?, last_changed = ?, '
+                                       'unchanged_count = 0 WHERE source = ?', (fingerprint, now, now, source))
+                    changed += 1
+
+            row = connection.execute('SELECT started FROM pending_refreshes WHERE website = ?',
+                                     (self.website_name,)).fetchone()
+            if row is not None and complete:
+                connection.execute('INSERT OR REPLACE INTO refreshes VALUES (?, ?)', (self.website_name, row[0]))
+                connection.execute('DELETE FROM pending_refreshes WHERE website = ?', (self.website_name,))
+                logging.info('Full refresh complete')
+
+        self.push()
+        logging.info(f'Recorded {len(fetched_data)} fetched applications, {changed} new or changed')
+
+    def get_recrawl_interval(self, unchanged_count: int) -> float:
+        """
+        :return: Returns the seconds to wait before fetching an application found unchanged unchanged_count times.
+        """
+        return min(self.recrawl_days * 2 ** unchanged_count, self.max_recrawl_days) * self.day
+
+    def get_fingerprint(self, data: dict) -> str:
+        data = {key: value for key, value in data.items() if key not in self.excluded_fields}
+
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def pull(self):
+        if not self.s3_bucket:
+            return
+
+        hook = S3Hook(aws_conn_id=self.aws_conn_id)
+        if hook.check_for_key(self.s3_key, bucket_name=self.s3_bucket):
+            hook.get_key(self.s3_key, bucket_name=self.s3_bucket).download_file(self.db_path)
+        else:
+            logging.info(f'No crawl state at s3://{self.s3_bucket}/{self.s3_key}, starting from scratch')
+
+    def push(self):
+        if not self.s3_bucket:
+            return
+
+        S3Hook(aws_conn_id=self.aws_conn_id).load_file(self.db_path, self.s3_key, bucket_name=self.s3_bucket,
+                                                        replace=True)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Commits on success and rolls back on error, the connection is always closed before the file is pushed.
+        connection = sqlite3.connect(self.db_path, timeout=self.lock_timeout)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS applications '
+                                   '(source TEXT PRIMARY KEY, fingerprint TEXT, first_seen REAL, last_fetched REAL, '
+                                   'last_changed REAL, unchanged_count INTEGER)')
+                connection.execute('CREATE TABLE IF NOT EXISTS refreshes '
+                                   '(website TEXT PRIMARY KEY, last_full_refresh REAL)')
+                connection.execute('CREATE TABLE IF NOT EXISTS pending_refreshes '
+                                   '(website TEXT PRIMARY KEY, started REAL)')
+                yield connection
+        finally:
+            connection.close()
@@ -1,4 +1,7 @@
+import csv
 import os
+import tempfile
+
 import pandas as pd
 
 
@@ -8,6 +11,52 @@ class CsvWriter:
         output_file_path = os.path.join(script_dir, '../output')
         self.output_file_path = output_file_path
 
-    def write(self, data: list, file_name: str):
+    def write(self, data: list, file_name: str, columns: tuple = None):
+        """
+        :param data: parsed records
+        :param file_name: name of the CSV, without extension, in the output directory
+        :param columns: columns written first and in order even when no record has them, usually the parser's
+        columns. Any other column found in the records follows them.
+        """
         df = pd.DataFrame(data)
-        df.to_csv(f'{self.output_file_path}/{file_name}.csv', index=False)
\ No newline at end of file
+        if columns:
+            extra_columns = [column for column in df.columns if column not in set(columns)]
+            df = df.reindex(columns=[*columns, *extra_columns])
+        df.to_csv(f'{self.output_file_path}/{file_name}.csv', index=False)
+
+    def write_stream(self, records, file_name: str, columns: tuple = ()) -> int:
+        """
+        :param records: iterable of parsed records, such as ParsingStrategy.parse_stream(), empty records are skipped
+        :param file_name: name of the CSV, without extension, in the output directory
+        :param columns: columns written first and in order, as in write()
+        :return: Returns the number of records written.
+        Rows are written as records arrive. Columns first seen part way through are added to the header once every
+        record is in, by copying the rows from a temporary file, so memory stays bounded by one record.
+        """
+        field_names = list(columns)
+        field_positions = {column: position for position, column in enumerate(field_names)}
+        record_count = 0
+        with tempfile.TemporaryFile('w+', encoding='utf-8', newline='', dir=self.output_file_path) as rows_file:
+            rows_writer = csv.writer(rows_file)
+            for record in records:
+                if not record:
+                    continue
+
+                for column in record:
+                    if column not in field_positions:
+                        field_positions[column] = len(field_names)
+                        field_names.append(column)
+
+                rows_writer.writerow([record.get(column) for column in field_names])
+                record_count += 1
+
+            rows_file.seek(0)
+            file_path = f'{self.output_file_path}/{file_name}.csv'
+            with open(f'{file_path}.tmp', 'w', encoding='utf-8', newline='') as csv_file:
+                csv_writer = csv.writer(csv_file)
+                csv_writer.writerow(field_names)
+                for row in csv.reader(rows_file):
+                    csv_writer.writerow(row + [''] * (len(field_names) - len(row)))
+            os.replace(f'{file_path}.tmp', file_path)
+
+        return record_count
\ No newline at end of file
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+try:
+    from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+except ImportError:
+    S3Hook = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_store_path = os.path.join(script_dir, '../output/documents')
+
+
+class DocumentWriter:
+    """
+    Binary file object handed to DownloaderStrategy.download_to_file. Chunks are written straight to a
+    temporary file in the store while their hash and size are tracked, so a document is never held in memory.
+    """
+    def __init__(self, store_path: str):
+        self._file = tempfile.NamedTemporaryFile(dir=store_path, suffix='.part', delete=False)
+        self.name = self._file.name
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes) -> int:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def truncate(self, size: int = None) -> int:
+        # Downloaders rewind and truncate before a retry, which always restarts the document from scratch.
+        self._file.seek(0)
+        self._file.truncate()
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+        return 0
+
+    def close(self):
+        self._file.close()
+
+
+class DocumentStore:
+    """
+    Content addressed document store. Each document is written once under its sha256, sharded as
+    ab/cd/abcd..., in store_path or, with an s3_bucket, under s3_prefix with store_path as a local cache.
+    Every source url is indexed against the hash it was saved as, so crawlers can look a document up by url
+    and skip the download altogether. Raw records only carry the handle returned by save() or lookup().
+    """
+    lock_timeout = 30  # In seconds
+
+    def __init__(self, store_path: str = None, s3_bucket: str = None, s3_prefix: str = 'documents',
+                 aws_conn_id: str = 'aws_default'):
+        self.store_path = store_path or default_store_path
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix.strip('/')
+        self.aws_conn_id = aws_conn_id
+        self._local = threading.local()
+
+        if self.s3_bucket and S3Hook is None:
+            raise Exception('DocumentStore on S3 needs apache-airflow-providers-amazon')
+
+        os.makedirs(self.store_path, exist_ok=True)
+        self._get_connection().execute('CREATE TABLE IF NOT EXISTS sources '
+                                       '(source TEXT PRIMARY KEY, sha256 TEXT, size INTEGER, content_type TEXT)')
+
+    def __getstate__(self):
+        # Thread local connections and hooks cannot be pickled, e.g. when a parser is sent to a worker process.
+        state = self.__dict__.copy()
+        del state['_local']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def writer(self) -> DocumentWriter:
+        return DocumentWriter(self.store_path)
+
+    def save(self, writer: DocumentWriter, source: str = None, content_type: str = None) -> dict:
+        """
+        :param writer: writer the document was downloaded into
+        :param source: url the document was downloaded from
+        :param content_type: Content-Type header of the response
+        :return: Returns a small, serialisable handle to the stored document.
+        """
+        writer.close()
+        document = dict(sha256=writer.sha256, size=writer.size, content_type=content_type, source=source)
+
+        if self._exists(writer.sha256):
+            # Already stored from another url or an earlier run, only the url needs indexing.
+            self.discard(writer)
+        elif self.s3_bucket:
+            self._get_hook().load_file(writer.name, self._get_key(writer.sha256), bucket_name=self.s3_bucket,
+                                       replace=True)
+            self._move_to_cache(writer.name, writer.sha256)
+        else:
+            self._move_to_cache(writer.name, writer.sha256)
+
+        if source:
+            self._index(document)
+
+        return document
+
+    def lookup(self, source: str) -> dict:
+        """
+        :param source: url of the document
+        :return: Returns the handle of the document previously saved from the url, or None if there is none.
+        """
+        row = self._get_connection().execute('SELECT sha256, size, content_type FROM sources WHERE source = ?',
+                                             (source,)).fetchone()
+        if row is not None:
+            document = dict(sha256=row[0], size=row[1], content_type=row[2], source=source)
+        elif self.s3_bucket:
+            document = self._lookup_s3(source)
+        else:
+            document = None
+
+        if document is None or not self._exists(document['sha256']):
+            return None
+
+        return document
+
+    @staticmethod
+    def discard(writer: DocumentWriter):
+        writer.close()
+        try:
+            os.remove(writer.name)
+        except FileNotFoundError:
+            pass
+
+    def open(self, document: dict):
+        document_path = self.get_path(document['sha256'])
+        if not os.path.exists(document_path):
+            if self.s3_bucket:
+                self._download(document['sha256'])
+            elif document.get('path'):
+                # Handles saved before the store was sharded carry the path of the unsharded file.
+                return open(document['path'], 'rb')
+
+        return open(document_path, 'rb')
+
+    def get_path(self, sha256: str) -> str:
+        return os.path.join(self.store_path, sha256[:2], sha256[2:4], sha256)
+
+    def _get_key(self, sha256: str) -> str:
+        return f'{self.s3_prefix}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+    def _get_source_key(self, source: str) -> str:
+        return f"{self.s3_prefix}/sources/{hashlib.sha256(source.encode('utf-8')).hexdigest()}.json"
+
+    def _exists(self, sha256: str) -> bool:
+        if os.path.exists(self.get_path(sha256)):
+            return True
+
+        return bool(self.s3_bucket) and self._get_hook().check_for_key(self._get_key(sha256),
+                                                                       bucket_name=self.s3_bucket)
+
+    def _download(self, sha256: str):
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.store_path, suffix='.part')
+        os.close(file_descriptor)
+        try:
+            self._get_hook().get_key(self._get_key(sha256), bucket_name=self.s3_bucket).download_file(temporary_path)
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+        self._move_to_cache(temporary_path, sha256)
+
+    def _move_to_cache(self, file_path: str, sha256: str):
+        document_path = self.get_path(sha256)
+        os.makedirs(os.path.dirname(document_path), exist_ok=True)
+        os.replace(file_path, document_path)
+
+    def _index(self, document: dict):
+        self._get_connection().execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                                       (document['source'], document['sha256'], document['size'],
+                                        document['content_type']))
+        if self.s3_bucket:
+            # Other workers only share the bucket, so the url index is mirrored there as one small object per url.
+            self._get_hook().load_bytes(json.dumps(document).encode('utf-8'), self._get_source_key(document['source']),
+                                        bucket_name=self.s3_bucket, replace=True)
+
+    def _lookup_s3(self, source: str) -> dict:
+        hook = self._get_hook()
+        source_key = self._get_source_key(source)
+        if not hook.check_for_key(source_key, bucket_name=self.s3_bucket):
+            return None
+
+        try:
+            document = json.loads(hook.read_key(source_key, bucket_name=self.s3_bucket))
+        except ValueError as e:
+            logging.error(f'_lookup_s3() error: {str(e)}')
+            return None
+
+        self._get_connection().execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                                       (source, document['sha256'], document['size'], document['content_type']))
+
+        return document
+
+    def _get_hook(self):
+        hook = getattr(self._local, 'hook', None)
+        if hook is None:
+            hook = S3Hook(aws_conn_id=self.aws_conn_id)
+            self._local.hook = hook
+
+        return hook
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads, keep one per thread.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.store_path, 'index.db'), timeout=self.lock_timeout,
+                                         isolation_level=None)
+            self._local.connection = connection
+
+        return connection
@@ -0,0 +1,106 @@
+import os
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_output_path = os.path.join(script_dir, '../output/parquet')
+
+
+class ParquetWriter:
+    """
+    Writes parsed records as Parquet, partitioned as council=<website>/capture_date=<date>/<file_name>.parquet so
+    readers can prune by council and capture date. The partition keys are named so they cannot clash with a parsed
+    column, such as Amber Valley's date_captured, when the dataset is read back with its partitioning. Each write
+    adds a part file to its partition and records are written in row groups of row_group_size as they arrive, so
+    memory is bounded by one row group.
+
+    The schema is the declared columns, typed from column_types and strings otherwise, followed by extra_fields, a
+    string map holding any undeclared column, so every part of a site has the same schema and nothing is lost when
+    a record carries a field the parser did not declare.
+    """
+    row_group_size = 10000
+    compression = 'snappy'
+    extra_fields_column = 'extra_fields'
+    arrow_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        bool: pa.bool_(),
+    }
+
+    def __init__(self, output_path: str = None, row_group_size: int = None):
+        self.output_path = output_path or default_output_path
+        self.row_group_size = row_group_size or self.row_group_size
+
+    def get_partition_path(self, council: str, capture_date: str) -> str:
+        return os.path.join(self.output_path, f'council={council}', f'capture_date={capture_date}')
+
+    def get_file_path(self, council: str, capture_date: str, file_name: str) -> str:
+        return os.path.join(self.get_partition_path(council, capture_date), f'{file_name}.parquet')
+
+    def write_stream(self, records, council: str, capture_date: str, file_name: str, columns: tuple = (),
+                     column_types: dict = None) -> int:
+        """
+        :param records: iterable of parsed records, empty records are skipped
+        :param council: website the records were crawled from, the first partition key
+        :param capture_date: date the records were crawled, as YYYY-MM-DD, the second partition key
+        :param file_name: name of the part file, without extension, an existing part of the same name is replaced
+        :param columns: declared columns, usually the parser's columns
+        :param column_types: declared column mapped to its python type, columns without one are strings
+        :return: Returns the number of records written.
+        """
+        records = (record for record in records if record)
+        row_group = list(islice(records, self.row_group_size))
+        if not row_group:
+            return 0
+
+        schema = self.get_schema(columns, column_types or {})
+        file_path = self.get_file_path(council, capture_date, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        record_count = 0
+        with pq.ParquetWriter(f'{file_path}.tmp', schema, compression=self.compression) as parquet_writer:
+            while row_group:
+                parquet_writer.write_table(self._to_table(row_group, schema))
+                record_count += len(row_group)
+                row_group = list(islice(records, self.row_group_size))
+
+        # Readers listing the partition never see a half written part.
+        os.replace(f'{file_path}.tmp', file_path)
+
+        return record_count
+
+    def get_schema(self, columns: tuple, column_types: dict) -> pa.Schema:
+        column_names = dict.fromkeys(columns)
+        column_names.pop(self.extra_fields_column, None)
+
+        return pa.schema([pa.field(column, self.arrow_types[column_types.get(column, str)])
+                          for column in column_names] +
+                         [pa.field(self.extra_fields_column, pa.map_(pa.string(), pa.string()))])
+
+    def _to_table(self, records: list, schema: pa.Schema) -> pa.Table:
+        python_types = {arrow_type: python_type for python_type, arrow_type in self.arrow_types.items()}
+        column_names = set(schema.names)
+
+        columns = {}
+        for field in schema:
+            if field.name == self.extra_fields_column:
+                columns[field.name] = [[(key, self._convert(value, str)) for key, value in record.items()
+                                        if key not in column_names] or None for record in records]
+            else:
+                python_type = python_types[field.type]
+                columns[field.name] = [self._convert(record.get(field.name), python_type) for record in records]
+
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    @staticmethod
+    def _convert(value, python_type: type):
+        if value is None or type(value) is python_type:
+            return value
+
+        try:
+            return python_type(value)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,183 @@
+import base64
+import gzip
+import json
+import logging
+import os
+import pickle
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_store_path = os.path.join(script_dir, '../output')
+
+
+def encode_value(value):
+    # Records crawled before documents were streamed to the document store can still carry raw PDF bytes.
+    if isinstance(value, (bytes, bytearray)):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def decode_object(value: dict):
+    if len(value) == 1 and '$bytes' in value:
+        return base64.b64decode(value['$bytes'])
+
+    return value
+
+
+class RawDataStore:
+    """
+    Compressed, sharded raw data files. A run's raw data is a directory of shards, one per writer, so mapped
+    tasks each write their own shard without coordinating. A shard is a series of gzip members of chunk_size
+    JSON lines each, which gzip reads back as one stream, so records are written and read one at a time and a
+    shard can be appended to by adding members. Every shard has a small JSON index of each record's key, such as
+    its reference number, to its chunk, so get() decompresses a single chunk rather than the whole run.
+    Records are streamed, so dumping or reparsing a run never holds more than one chunk in memory:
+        writer.write_stream(parser.parse_stream(raw_data_store.load(file_name)), file_name, columns=parser.columns)
+    """
+    chunk_size = 100  # Records per gzip member
+    shard_suffix = '.jsonl.gz'
+    index_suffix = '.index.json'
+
+    def __init__(self, store_path: str = None, chunk_size: int = None):
+        self.store_path = store_path or default_store_path
+        self.chunk_size = chunk_size or self.chunk_size
+        os.makedirs(self.store_path, exist_ok=True)
+
+    def get_path(self, file_name: str) -> str:
+        return os.path.join(self.store_path, file_name)
+
+    def get_shards(self, file_name: str) -> list:
+        file_path = self.get_path(file_name)
+        if not os.path.isdir(file_path):
+            return []
+
+        return sorted(entry[:-len(self.shard_suffix)] for entry in os.listdir(file_path)
+                      if entry.endswith(self.shard_suffix))
+
+    def get_shard_paths(self, file_name: str, shard: str) -> tuple:
+        """
+        :return: Returns the paths of the shard's records and of its index.
+        """
+        return (os.path.join(self.get_path(file_name), f'{shard}{self.shard_suffix}'),
+                os.path.join(self.get_path(file_name), f'{shard}{self.index_suffix}'))
+
+    def dump(self, records, file_name: str, shard: str = '00000', keys=None, append: bool = False) -> int:
+        """
+        :param records: iterable of raw data records, empty records are skipped
+        :param file_name: name of the run's raw data, a directory in the store
+        :param shard: name of the shard to write, only one writer may write a given shard at a time
+        :param keys: iterable of the records' keys, in the same order, such as the sources they were crawled from.
+        Records are keyed by their source field, or their position, by default.
+        :param append: adds the records to the end of an existing shard instead of replacing it
+        :return: Returns the number of records written.
+        """
+        os.makedirs(self.get_path(file_name), exist_ok=True)
+        shard_path, index_path = self.get_shard_paths(file_name, shard)
+
+        index = {}
+        if append and os.path.exists(shard_path):
+            index = self._load_index(index_path)
+            write_path = shard_path
+        else:
+            # A rewritten shard, e.g. by a retried task, is replaced whole so readers never see a partial one.
+            append = False
+            write_path = f'{shard_path}.{os.getpid()}.tmp'
+
+        record_count = 0
+        with open(write_path, 'ab' if append else 'wb') as shard_file:
+            chunk = []
+            for position, (key, record) in enumerate(zip(keys if keys is not None else self._no_keys(), records)):
+                if not record:
+                    continue
+
+                if key is None:
+                    key = record.get('source') or f'{shard}:{shard_file.tell()}:{position}'
+                chunk.append((str(key), json.dumps(record, default=encode_value)))
+                record_count += 1
+
+                if len(chunk) >= self.chunk_size:
+                    self._write_chunk(shard_file, chunk, index)
+                    chunk = []
+
+            if chunk:
+                self._write_chunk(shard_file, chunk, index)
+
+        if not append:
+            os.replace(write_path, shard_path)
+        self._dump_index(index, index_path)
+
+        return record_count
+
+    def load(self, file_name: str, shards: list = None):
+        """
+        :param file_name: name of the run's raw data
+        :param shards: names of the shards to read, all of them in name order by default
+        :return: Returns a generator of the records, read lazily.
+        """
+        shards = shards if shards is not None else self.get_shards(file_name)
+        if not shards and os.path.exists(f'{self.get_path(file_name)}.pkl'):
+            yield from self._load_pickle(file_name)
+            return
+
+        for shard in shards:
+            with gzip.open(os.path.join(self.get_path(file_name), f'{shard}{self.shard_suffix}'), 'rt',
+                           encoding='utf-8') as shard_file:
+                for line in shard_file:
+                    if line.strip():
+                        yield json.loads(line, object_hook=decode_object)
+
+    def get(self, file_name: str, key: str) -> dict:
+        """
+        :param file_name: name of the run's raw data
+        :param key: key the record was written with
+        :return: Returns the record, or None if no shard has the key. When several shards have it, the last shard
+        in name order wins.
+        """
+        for shard in reversed(self.get_shards(file_name)):
+            location = self._load_index(os.path.join(self.get_path(file_name), f'{shard}{self.index_suffix}')).get(
+                str(key))
+            if location is None:
+                continue
+
+            chunk_offset, chunk_length, line_number = location
+            with open(os.path.join(self.get_path(file_name), f'{shard}{self.shard_suffix}'), 'rb') as shard_file:
+                # Only the chunk's own gzip member is read and decompressed.
+                shard_file.seek(chunk_offset)
+                chunk_lines = gzip.decompress(shard_file.read(chunk_length)).decode('utf-8').split('\n')
+
+            return json.loads(chunk_lines[line_number], object_hook=decode_object)
+
+        return None
+
+    @staticmethod
+    def _write_chunk(shard_file, chunk: list, index: dict):
+        chunk_offset = shard_file.tell()
+        chunk_length = shard_file.write(gzip.compress(''.join(f'{line}\n' for _, line in chunk).encode('utf-8')))
+        for line_number, (key, _) in enumerate(chunk):
+            index[key] = [chunk_offset, chunk_length, line_number]
+
+    @staticmethod
+    def _no_keys():
+        while True:
+            yield None
+
+    @staticmethod
+    def _load_index(index_path: str) -> dict:
+        if not os.path.exists(index_path):
+            return {}
+
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            return json.load(index_file)
+
+    @staticmethod
+    def _dump_index(index: dict, index_path: str):
+        temporary_path = f'{index_path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as index_file:
+            json.dump(index, index_file)
+        os.replace(temporary_path, index_path)
+
+    def _load_pickle(self, file_name: str):
+        # Runs dumped before the store was sharded are a single pickle of the whole record list.
+        logging.info(f'Loading {file_name} from a legacy pickle, the whole run is read into memory')
+        with open(f'{self.get_path(file_name)}.pkl', 'rb') as pickle_file:
+            yield from pickle.load(pickle_file)
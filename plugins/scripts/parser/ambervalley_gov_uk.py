@@ -2,18 +2,37 @@ import base64
 import io
 import json
 import logging
-import re
-
-from PyPDF2 import PdfReader
 
 from scripts.base.parser import ParsingStrategy
-from scripts.parser.defaults import Defaults
+from scripts.file_handler.document_store import DocumentStore
+from scripts.parser.document_extractor import DocumentTextExtractor
+from scripts.parser.field_schema import Field, FieldSchema, camel_to_snake_case, clean_whitespace
 
 
 class AmbervalleyGovUkParsingStrategy(ParsingStrategy):
+    document_patterns = {
+        'easting': r'Easting \(x\) (\d+)Northing',
+        'northings': r'\(y\) (\d+)',
+        'planning_portal_reference': r'(PP-\d{7})',
+    }
+    # The application details are the site's JSON fields, whose camelCase names are snake cased. Fields the feed
+    # adds later still get a column of their own, after the declared ones.
+    application_details_schema = FieldSchema(
+        {key: Field(camel_to_snake_case(key), cleaner=clean_whitespace) for key in (
+            'refVal', 'applicationType', 'proposal', 'location', 'parish', 'ward', 'applicantName', 'agentName',
+            'caseOfficer', 'status', 'dateReceived', 'dateValid', 'decision', 'decisionDate')},
+        key_formatter=camel_to_snake_case, excluded_columns=('date8_week',), cleaner=clean_whitespace)
+    columns = ('date_captured', 'application_details_source', *application_details_schema.columns,
+               'application_form_document_source', 'easting', 'northings', 'planning_portal_reference')
+    column_types = application_details_schema.column_types
+
+    def __init__(self, document_store: DocumentStore = None, document_extractor: DocumentTextExtractor = None):
+        self.document_store = document_store if document_store is not None else DocumentStore()
+        self.document_extractor = document_extractor if document_extractor is not None \
+            else DocumentTextExtractor(self.document_patterns)
+
     def parse(self, data: dict) -> dict:
         parsed_data = {}
-        excluded_keys = ['date8_week']
         try:
             if 'date_captured' in data:
                 parsed_data['date_captured'] = data['date_captured']
@@ -22,39 +41,33 @@ class AmbervalleyGovUkParsingStrategy(ParsingStrategy):
                 application_details = data['application_details']
                 if application_details.get('data', None):
                     parsed_data['application_details_source'] = application_details['source']
-                    for key, val in application_details['data'].items():
-                        if val:
-                            words = re.findall(r'[A-Za-z][a-z]*|[A-Z][a-z]*', key)
-                            snake_case_key = '_'.join(word.lower() for word in words)
-
-                            if snake_case_key in excluded_keys:
-                                continue
-
-                            parsed_data[snake_case_key] = re.sub(r'\s', ' ', val) \
-                                if isinstance(val, str) else val
+                    self.application_details_schema.apply(
+                        ((key, val) for key, val in application_details['data'].items() if val), parsed_data)
+                else:
+                    self.application_details_schema.apply((), parsed_data)
 
             if 'application_form_document' in data and data['application_form_document']:
                 application_form_document = data['application_form_document']
-                if application_form_document.get('data', None):
+                document_values = None
+                if application_form_document.get('document', None):
+                    # A document that cannot be opened gives EXTRACTION_ERROR values rather than losing the record.
+                    document_values = self.document_extractor.extract_document(self.document_store,
+                                                                               application_form_document['document'])
+                elif application_form_document.get('data', None):
+                    # Records crawled before documents were streamed to the store carry the PDF base64 encoded.
+                    document_values = self.document_extractor.extract(
+                        io.BytesIO(base64.b64decode(application_form_document['data'])))
+
+                if document_values:
                     parsed_data['application_form_document_source'] = application_form_document['source']
 
-                    document_data = base64.b64decode(application_form_document['data'])
-                    document_byte_stream = io.BytesIO(document_data)
-                    document = PdfReader(document_byte_stream)
-
-                    document_text = ' '.join([page.extract_text() for page in document.pages]).strip()
-                    document_text = re.sub(r'\s+', ' ', document_text)
-
                     if 'eastings' not in parsed_data:
-                        parsed_data['easting'] = self._get_document_values(document_text,
-                                                                           r'Easting \(x\) (\d+)Northing')
+                        parsed_data['easting'] = document_values['easting']
 
                     if 'northings' not in parsed_data:
-                        parsed_data['northings'] = self._get_document_values(document_text,
-                                                                             r"\(y\) (\d+)")
+                        parsed_data['northings'] = document_values['northings']
 
-                    parsed_data['planning_portal_reference'] = self._get_document_values(document_text,
-                                                                                         r"(PP-\d{7})")
+                    parsed_data['planning_portal_reference'] = document_values['planning_portal_reference']
 
         except json.decoder.JSONDecodeError as e:
             logging.error(f'parse() error: {str(e)}')
@@ -62,17 +75,3 @@ class AmbervalleyGovUkParsingStrategy(ParsingStrategy):
             logging.error(f'parse() error: {str(e)}')
 
         return parsed_data
-
-    @staticmethod
-    def _get_document_values(document_text, pattern: str) -> str:
-        value = Defaults.NOT_FOUND.value
-        try:
-            matches = list(re.finditer(pattern, document_text))
-            if matches:
-                value = ' '.join(set([match.group(1) for match in matches]))
-
-        except Exception as e:
-            logging.error(f'_get_document_values() error: {str(e)}')
-            value = Defaults.EXTRACTION_ERROR.value
-
-        return value
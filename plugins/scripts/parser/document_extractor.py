@@ -0,0 +1,148 @@
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import threading
+
+from PyPDF2 import PdfReader
+
+from scripts.parser.defaults import Defaults
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_cache_dir = os.path.join(script_dir, '../output/document_text')
+
+
+class DocumentTextExtractor:
+    """
+    Extracts the values of a fixed set of patterns from PDF documents. Each document's text is extracted once,
+    whitespace normalised and cached on disk by its sha256, then each precompiled pattern is matched on its own,
+    so patterns can match overlapping text. Each pattern must have exactly one capture group, holding the value.
+
+    The cache is kept under max_cache_bytes by removing the least recently used texts whenever a new one is
+    written.
+
+    With stop_early, pages are extracted only until every pattern has matched, which for application forms
+    usually means the site location section on the first pages.
+    """
+    max_cache_bytes = 1024 * 1024 * 1024  # In bytes
+
+    def __init__(self, patterns: dict, cache_dir: str = None, stop_early: bool = False, max_cache_bytes: int = None):
+        self.patterns = patterns
+        self.cache_dir = cache_dir or default_cache_dir
+        self.stop_early = stop_early
+        self.max_cache_bytes = max_cache_bytes or self.max_cache_bytes
+        self.matchers = {name: re.compile(pattern) for name, pattern in patterns.items()}
+        self.patterns_digest = hashlib.sha256('\n'.join(patterns.values()).encode('utf-8')).hexdigest()[:12]
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def extract(self, document_stream, sha256: str = None) -> dict:
+        """
+        :param document_stream: binary stream of the PDF, closed once the text has been read
+        :param sha256: hash of the document, computed from the stream when not given
+        :return: Returns each pattern name mapped to its unique matches joined by spaces, Defaults.NOT_FOUND
+        when it did not match and Defaults.EXTRACTION_ERROR when the text could not be extracted.
+        """
+        try:
+            with document_stream:
+                document_text = self.get_text(document_stream, sha256)
+        except Exception as e:
+            logging.error(f'extract() error: {str(e)}')
+            return {name: Defaults.EXTRACTION_ERROR.value for name in self.patterns}
+
+        return self.match(document_text)
+
+    def extract_document(self, document_store, document: dict) -> dict:
+        """
+        :param document_store: DocumentStore the document was saved to
+        :param document: handle returned by the store's save() or lookup()
+        :return: Returns the values as extract() does, with Defaults.EXTRACTION_ERROR when the document cannot be
+        opened, such as when it was saved to the local disk of another worker.
+        """
+        try:
+            document_stream = document_store.open(document)
+        except Exception as e:
+            logging.error(f'extract_document() error: {str(e)}')
+            return {name: Defaults.EXTRACTION_ERROR.value for name in self.patterns}
+
+        return self.extract(document_stream, document.get('sha256'))
+
+    def match(self, document_text: str) -> dict:
+        matches = {name: dict.fromkeys(match.group(1) for match in matcher.finditer(document_text))
+                   for name, matcher in self.matchers.items()}
+
+        return {name: ' '.join(values) if values else Defaults.NOT_FOUND.value for name, values in matches.items()}
+
+    def get_text(self, document_stream, sha256: str = None) -> str:
+        if sha256 is None:
+            sha256 = self._get_sha256(document_stream)
+
+        # Text extracted with stop_early can be partial, so it is only reused for the same patterns.
+        cache_path = os.path.join(self.cache_dir, f'{sha256}.{self.patterns_digest}.txt' if self.stop_early
+                                  else f'{sha256}.txt')
+        full_text_path = os.path.join(self.cache_dir, f'{sha256}.txt')
+        for path in (cache_path, full_text_path):
+            try:
+                with open(path, 'r', encoding='utf-8') as text_file:
+                    document_text = text_file.read()
+            except FileNotFoundError:
+                continue
+
+            # The modification time marks when a text was last used, so often parsed documents stay cached.
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            return document_text
+
+        document_text = self._extract_text(PdfReader(document_stream))
+
+        temporary_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as text_file:
+            text_file.write(document_text)
+        os.replace(temporary_path, cache_path)
+        self._evict()
+
+        return document_text
+
+    def _extract_text(self, document: PdfReader) -> str:
+        page_texts = []
+        for page in document.pages:
+            page_texts.append(page.extract_text())
+            if self.stop_early:
+                page_text = self._normalize(page_texts)
+                if all(matcher.search(page_text) for matcher in self.matchers.values()):
+                    break
+
+        return self._normalize(page_texts)
+
+    def _evict(self):
+        cached_texts = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.txt'):
+                    with contextlib.suppress(OSError):
+                        entry_stat = entry.stat()
+                        cached_texts.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+        cache_bytes = sum(size for _, size, _ in cached_texts)
+        for _, size, path in sorted(cached_texts):
+            if cache_bytes <= self.max_cache_bytes:
+                break
+
+            # Another extractor sharing the cache may have removed it already.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            cache_bytes -= size
+
+    @staticmethod
+    def _normalize(page_texts: list) -> str:
+        return re.sub(r'\s+', ' ', ' '.join(page_texts).strip())
+
+    @staticmethod
+    def _get_sha256(document_stream) -> str:
+        document_hash = hashlib.sha256()
+        for chunk in iter(lambda: document_stream.read(64 * 1024), b''):
+            document_hash.update(chunk)
+        document_stream.seek(0)
+
+        return document_hash.hexdigest()
@@ -0,0 +1,116 @@
+import re
+from typing import Callable, NamedTuple
+
+whitespace_pattern = re.compile(r'\s')
+camel_case_word_pattern = re.compile(r'[A-Za-z][a-z]*|[A-Z][a-z]*')
+
+
+def clean_whitespace(value: str) -> str:
+    return whitespace_pattern.sub(' ', value)
+
+
+def camel_to_snake_case(key: str) -> str:
+    return '_'.join(word.lower() for word in camel_case_word_pattern.findall(key))
+
+
+def label_to_snake_case(key: str) -> str:
+    return key.replace(' ', '_').lower()
+
+
+def letters_only(key: str) -> str:
+    return ''.join(char for char in key if char.isalpha())
+
+
+class Field(NamedTuple):
+    column: str
+    type: type = str
+    cleaner: Callable = None
+
+
+class FieldSchema:
+    """
+    Declarative mapping of a site's source keys, such as API field names or page labels, to output columns.
+    Each source key is compiled once into a Field, from fields when it is declared there or from key_formatter
+    otherwise, and memoized, so parsing a record is a single pass of dictionary lookups. Columns listed in
+    excluded_columns compile to None and are dropped.
+
+    columns holds the declared fields' columns in order. Every record gets all of them, with missing_value for the
+    fields it did not carry, so the column set is fixed whichever fields a page happens to show. Declared values
+    are converted to their field's type. Undeclared source keys are kept as they are under their own column, which
+    writers put after the declared ones.
+    """
+    def __init__(self, fields: dict = None, key_formatter: Callable = None, excluded_columns: tuple = (),
+                 cleaner: Callable = None, missing_value=None):
+        """
+        :param fields: source key mapped to its Field
+        :param key_formatter: turns an undeclared source key into its column name, the key is kept as is by default
+        :param excluded_columns: columns that are never output
+        :param cleaner: applied to the string values of undeclared source keys
+        :param missing_value: value of the declared columns a record has no field for
+        """
+        self.fields = fields or {}
+        self.key_formatter = key_formatter
+        self.excluded_columns = frozenset(excluded_columns)
+        self.cleaner = cleaner
+        self.missing_value = missing_value
+        self.columns = tuple(dict.fromkeys(field.column for field in self.fields.values()
+                                           if field.column not in self.excluded_columns))
+        self.column_types = {field.column: field.type for field in self.fields.values()
+                             if field.column not in self.excluded_columns}
+        self._compiled_fields = {}
+
+    def get_field(self, source_key: str) -> Field:
+        """
+        :return: Returns the compiled Field of the source key, or None if its column is excluded.
+        """
+        try:
+            return self._compiled_fields[source_key]
+        except KeyError:
+            pass
+
+        field = self.fields.get(source_key)
+        if field is None:
+            column = self.key_formatter(source_key) if self.key_formatter else source_key
+            field = Field(column, type=None, cleaner=self.cleaner)
+        if field.column in self.excluded_columns:
+            field = None
+
+        # Concurrent parsers may compile the same key twice, which is harmless as both results are equal.
+        self._compiled_fields[source_key] = field
+
+        return field
+
+    def apply(self, items, parsed_data: dict = None) -> dict:
+        """
+        :param items: iterable of (source key, value) pairs
+        :param parsed_data: record the columns are added to, a new one by default
+        :return: Returns parsed_data with every value under its column, converted to the field's type and cleaned
+        when it is a string, and missing_value under each declared column none of the items had.
+        """
+        if parsed_data is None:
+            parsed_data = {}
+
+        get_field = self.get_field
+        for source_key, value in items:
+            field = get_field(source_key)
+            if field is None:
+                continue
+
+            if field.type is not None and value is not None and type(value) is not field.type:
+                value = self._convert(value, field.type)
+            if field.cleaner is not None and isinstance(value, str):
+                value = field.cleaner(value)
+            parsed_data[field.column] = value
+
+        for column in self.columns:
+            if column not in parsed_data:
+                parsed_data[column] = self.missing_value
+
+        return parsed_data
+
+    @staticmethod
+    def _convert(value, field_type: type):
+        try:
+            return field_type(value)
+        except (TypeError, ValueError):
+            return None
@@ -1,64 +1,96 @@
-import copy
 import io
 import logging
-import re
 
 from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
 
 from scripts.base.parser import ParsingStrategy
+from scripts.file_handler.document_store import DocumentStore
 from scripts.parser.defaults import Defaults
+from scripts.parser.document_extractor import DocumentTextExtractor
+from scripts.parser.field_schema import Field, FieldSchema, clean_whitespace, label_to_snake_case, letters_only
 
 
 class WandsworthGovUkParsingStrategy(ParsingStrategy):
+    document_patterns = {
+        'easting': r'Easting \(x\) (\d+)Northing',
+        'northing': r'\(y\) (\d+)',
+        'planning_portal_reference': r'(PP-\d{7})',
+    }
+    # Both pages are label and value spans. Main page labels keep only their letters, date labels are snake cased.
+    # Labels a page does not show are Defaults.NOT_FOUND, labels the site adds later get a column after these.
+    main_page_schema = FieldSchema(
+        {label: Field(letters_only(label), cleaner=clean_whitespace) for label in (
+            'Application Number', 'Site Address', 'Application Type', 'Development Type', 'Proposal',
+            'Current Status', 'Applicant', 'Agent', 'Wards', 'Location Co ordinates', 'Parishes', 'Case Officer / Tel',
+            'Division', 'Planning Officer', 'Recommendation', 'Determination Level', 'Existing Land Use',
+            'Proposed Land Use')},
+        key_formatter=letters_only, missing_value=Defaults.NOT_FOUND.value)
+    dates_page_schema = FieldSchema(
+        {label: Field(label_to_snake_case(label)) for label in (
+            'Received', 'Registered', 'Valid', 'First Advertised', 'First Site Notice', 'Consultation Period Ends',
+            'Statutory Expiry Date', 'Decision Made', 'Decision Issued', 'Appeal Lodged')},
+        key_formatter=label_to_snake_case, missing_value=Defaults.NOT_FOUND.value)
+    columns = ('source', *main_page_schema.columns, *dates_page_schema.columns, *document_patterns)
+    column_types = {**main_page_schema.column_types, **dates_page_schema.column_types}
+
+    def __init__(self, document_store: DocumentStore = None, document_extractor: DocumentTextExtractor = None):
+        self.document_store = document_store if document_store is not None else DocumentStore()
+        self.document_extractor = document_extractor if document_extractor is not None \
+            else DocumentTextExtractor(self.document_patterns)
+
     def parse(self, raw_data: dict):
         data = {}
         try:
             main_details_soup = None
+            main_details_index = {}
             dates_soup = None
+            dates_index = {}
             document = None
+            document_stream = None
+
+            # The crawler stores the pages as main_page_data and dates_page_data, older records used the other names.
+            main_details_data = raw_data.get('main_page_data') or raw_data.get('main_details_data')
+            dates_data = raw_data.get('dates_page_data') or raw_data.get('dates_data')
 
-            if 'main_details_data' in raw_data and raw_data['main_details_data']:
-                main_details_soup = BeautifulSoup(raw_data['main_details_data'], 'lxml')
-                application_number = None if not main_details_soup \
-                    else self._get_table_value(main_details_soup, 'Application Number')
+            if main_details_data:
+                main_details_soup = BeautifulSoup(main_details_data, 'lxml')
+                main_details_index = self._get_field_index(main_details_soup)
+                application_number = main_details_index.get('Application Number', Defaults.NOT_FOUND.value)
                 if application_number:
                     logging.info(f'Parsing through Application Number: {application_number}')
                 else:
                     raise
 
-            if 'dates_data' in raw_data and raw_data['dates_data']:
-                dates_soup = BeautifulSoup(raw_data['dates_data'], 'lxml')
+            if dates_data:
+                dates_soup = BeautifulSoup(dates_data, 'lxml')
+                dates_index = self._get_field_index(dates_soup)
 
-            if 'document_data' in raw_data and raw_data['document_data']:
-                document_byte_stream = io.BytesIO(raw_data['document_data'])
-                document = PdfReader(document_byte_stream)
+            document_data = raw_data.get('application_form_document_data')
+            if isinstance(document_data, (bytes, bytearray)):
+                # Records crawled before documents were streamed to the store carry the raw PDF bytes instead.
+                document_stream = io.BytesIO(document_data)
+            elif isinstance(document_data, dict):
+                document = document_data
 
             if 'source' in raw_data and raw_data['source']:
                 data['source'] = raw_data['source']
 
-            if main_details_soup:
-                main_field_tags = main_details_soup.select('div > span')
-                if main_field_tags:
-                    main_field_titles = [tag.get_text().strip() for tag in main_field_tags if tag.get_text().strip()]
-                    for title in main_field_titles:
-                        key = self.format_title(title)
-                        raw_value = self._get_table_value(main_details_soup, title)
-                        value = self.clean_substring(raw_value)
-
-                        data.update({key: value})
+            main_field_titles = (tag.get_text().strip() for tag in main_details_soup.select('div > span')) \
+                if main_details_soup else ()
+            self.main_page_schema.apply(
+                ((title, main_details_index.get(title, Defaults.NOT_FOUND.value)) for title in main_field_titles
+                 if title), data)
 
-            if dates_soup:
-                date_field_tags = dates_soup.select('div > span')
-                if date_field_tags:
-                    date_field_tags = [tag.get_text().strip() for tag in date_field_tags if tag.get_text().strip()]
-                    data.update({title.replace(' ', '_').lower(): self._get_table_value(dates_soup, title)
-                                 for title in date_field_tags})
+            date_field_titles = (tag.get_text().strip() for tag in dates_soup.select('div > span')) \
+                if dates_soup else ()
+            self.dates_page_schema.apply(
+                ((title, dates_index.get(title, Defaults.NOT_FOUND.value)) for title in date_field_titles
+                 if title), data)
 
             if document:
-                data['easting'] = self._get_document_values(document, r'Easting \(x\) (\d+)Northing')
-                data['northing'] = self._get_document_values(document, r"\(y\) (\d+)")
-                data['planning_portal_reference'] = self._get_document_values(document, r"(PP-\d{7})")
+                data.update(self.document_extractor.extract_document(self.document_store, document))
+            elif document_stream:
+                data.update(self.document_extractor.extract(document_stream))
 
         except Exception as e:
             logging.error(f'parse() error: {str(e)}')
@@ -66,51 +98,19 @@ class WandsworthGovUkParsingStrategy(ParsingStrategy):
         return data
 
     @staticmethod
-    def _get_document_values(document, pattern: str) -> str:
-        value = Defaults.NOT_FOUND.value
-        try:
-            page_text = ' '.join([page.extract_text() for page in document.pages]).strip()
-            page_text = re.sub(r'\s+', ' ', page_text)
-
-            matches = list(re.finditer(pattern, page_text))
-            if matches:
-                value = ' '.join(set([match.group(1) for match in matches]))
-
-        except Exception as e:
-            logging.error(f'_get_document_values() error: {str(e)}')
-            value = Defaults.EXTRACTION_ERROR.value
-
-        return value
-
-    @staticmethod
-    def _get_table_value(soup, column_name: str) -> str:
-        value = Defaults.NOT_FOUND.value
-        soup_copy = copy.deepcopy(soup)
-        try:
-            pattern = re.compile(f'^' + re.escape(column_name) + '$')
-            child_tag = soup_copy.find('span', text=pattern)
-            if child_tag:
-                parent_tag = child_tag.parent
-                child_tag.decompose()
-
-                tag_text = parent_tag.get_text().strip()
-
-                if tag_text:
-                    value = tag_text
-
-        except Exception as e:
-            logging.error(f'_get_table_values() error: {str(e)}')
-            value = Defaults.EXTRACTION_ERROR.value
-
-        return value
-
-    @staticmethod
-    def format_title(title: str):
-        filtered_string = ''.join([char for char in title if char.isalpha()])
-        formatted_title = filtered_string.strip().replace(' ', '_')
-
-        return formatted_title
-
-    @staticmethod
-    def clean_substring(substring):
-        return re.sub(r'\s', substring, ' ')
+    def _get_field_index(soup: BeautifulSoup) -> dict:
+        """
+        :param soup: BeautifulSoup object of a main details or dates page
+        :return: Returns every span label mapped to the text of its parent without the label, built in one pass.
+        The first span with a given label wins and labels without a value map to Defaults.NOT_FOUND.
+        """
+        field_index = {}
+        for label_tag in soup.find_all('span'):
+            label = label_tag.string
+            if label is None or label in field_index:
+                continue
+
+            value = ''.join(text for text in label_tag.parent.strings if text is not label).strip()
+            field_index[str(label)] = value or Defaults.NOT_FOUND.value
+
+        return field_index
@@ -1,6 +1,13 @@
+import logging
 import re
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = None
+    lxml_html = None
 
 
 def get_href(soup: BeautifulSoup, bs_selector: str) -> str:
@@ -24,3 +31,71 @@ def clean_href(href: str) -> str:
     :return:
     """
     return re.sub(r'\s', '', href.replace(" ", "%20"))
+
+
+def get_class_xpath(class_name: str) -> str:
+    """
+    :param class_name: CSS class
+    :return: Returns an XPath predicate matching elements that have the class, like the CSS .class_name selector.
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def parse_lxml(markup: str):
+    """
+    :param markup: html of the page
+    :return: Returns the lxml root element of the page, or None if lxml is missing or cannot parse it.
+    """
+    if lxml_html is None or not markup:
+        return None
+
+    try:
+        # Pages can declare their own encoding, which lxml refuses on str input, so they are parsed as utf-8 bytes.
+        return lxml_html.fromstring(markup.encode('utf-8'), parser=lxml_html.HTMLParser(encoding='utf-8'))
+    except (etree.ParserError, ValueError) as e:
+        logging.debug(f'parse_lxml() error, falling back to BeautifulSoup: {str(e)}')
+        return None
+
+
+def select_attribute_values(markup: str, xpath: str, bs_selector: str, attribute: str,
+                            parse_only: SoupStrainer = None) -> list:
+    """
+    Extracts attribute values from a page without building a BeautifulSoup tree, using lxml and XPath directly.
+    BeautifulSoup with the standard library's html.parser, restricted to parse_only if given, is used when lxml is
+    missing or cannot parse the page.
+    :param markup: html of the page
+    :param xpath: XPath selecting the attribute values, e.g. //td[...]//a/@href
+    :param bs_selector: selector to be passed in a select() method, equivalent to the XPath
+    :param attribute: attribute read from the tags matched by bs_selector
+    :return: Returns the attribute values in document order.
+    """
+    root = parse_lxml(markup)
+    if root is not None:
+        return [str(value) for value in root.xpath(xpath)]
+
+    soup = BeautifulSoup(markup or '', 'html.parser', parse_only=parse_only)
+
+    return [tag[attribute] for tag in soup.select(bs_selector) if tag.has_attr(attribute)]
+
+
+def get_input_values(markup: str, input_ids: list) -> dict:
+    """
+    :param markup: html of the page
+    :param input_ids: ids of the input tags, e.g. ASP.NET's __VIEWSTATE
+    :return: Returns each id mapped to the value of its first input tag, or None if the page has no such input.
+    """
+    input_values = dict.fromkeys(input_ids)
+
+    root = parse_lxml(markup)
+    if root is not None:
+        id_predicate = ' or '.join(f'@id="{input_id}"' for input_id in input_ids)
+        input_tags = root.xpath(f'//input[{id_predicate}]')
+    else:
+        soup = BeautifulSoup(markup or '', 'html.parser', parse_only=SoupStrainer('input', id=list(input_ids)))
+        input_tags = soup.find_all('input')
+
+    for tag in input_tags:
+        if input_values[tag.get('id')] is None:
+            input_values[tag.get('id')] = tag.get('value')
+
+    return input_values
@@ -2,14 +2,114 @@ import importlib
 import json
 import os
 
+from scripts.downloader.cached_downloader import CachedDownloader
+from scripts.downloader.cassette import RecordingDownloader
+from scripts.downloader.rate_limiter import TokenBucketRateLimiter
+from scripts.file_handler.crawl_state import CrawlState
+from scripts.file_handler.csv_writer import CsvWriter
+from scripts.file_handler.document_store import DocumentStore
+from scripts.file_handler.raw_data_store import RawDataStore
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 mapping_file_path = os.path.join(script_dir, '..', 'mapping.json')
 
+downloader_classes = {
+    'default': 'scripts.downloader.default_downloader.DefaultDownloader',
+    'zyte': 'scripts.downloader.zyte_downloader.ZyteDownloader',
+    'async': 'scripts.downloader.async_downloader.AsyncDownloader',
+    'replay': 'scripts.downloader.cassette.ReplayDownloader',
+}
+
 
-def get_crawling_strategy(website_name: str):
+def get_site_config(website_name: str) -> dict:
+    """
+    :param website_name: key of the website in mapping.json
+    :return: Returns the website's mapping entry. Plain string entries are treated as {"module": entry}.
+    """
     with open(mapping_file_path, "r") as file:
         mapping = json.load(file)
-        file_name = mapping[website_name]
+        site_config = mapping[website_name]
+
+    if isinstance(site_config, str):
+        site_config = {'module': site_config}
+
+    return site_config
+
+
+def get_downloader(website_name: str):
+    site_config = get_site_config(website_name)
+    downloader_config = dict(site_config.get('downloader', {'type': 'zyte', 'country': 'uk'}))
+
+    downloader_type = downloader_config.pop('type', 'zyte')
+
+    module_name, class_name = downloader_classes[downloader_type].rsplit('.', 1)
+    downloader_class = getattr(importlib.import_module(module_name), class_name)
+
+    # Replayed responses never reach the site, so they are not rate limited.
+    rate_limit = site_config.get('rate_limit')
+    if rate_limit and downloader_type != 'replay':
+        downloader_config['rate_limiter'] = TokenBucketRateLimiter(**rate_limit)
+
+    downloader = downloader_class(**downloader_config)
+
+    cache = site_config.get('cache')
+    if cache:
+        downloader = CachedDownloader(downloader, **cache)
+
+    record = site_config.get('record')
+    if record:
+        downloader = RecordingDownloader(downloader, **record)
+
+    return downloader
+
+
+def get_document_store(website_name: str) -> DocumentStore:
+    """
+    :param website_name: key of the website in mapping.json
+    :return: Returns the document store configured for the website. It needs an s3_bucket, as documents saved
+    by a crawl task are opened by a parse task that may run on a different worker. Scripts that crawl and parse in
+    one process can pass their own local DocumentStore to the strategies instead.
+    """
+    document_store = get_site_config(website_name).get('document_store', {})
+    if not document_store.get('s3_bucket'):
+        raise Exception(f'Documents of {website_name} need a document_store s3_bucket in mapping.json')
+
+    return DocumentStore(**document_store)
+
+
+def get_crawl_state(website_name: str) -> CrawlState:
+    """
+    :param website_name: key of the website in mapping.json
+    :return: Returns the website's crawl state if it is crawled incrementally, otherwise None.
+    Incremental crawls need an s3_bucket, as the tasks that read and update the state may run on different workers.
+    """
+    incremental = get_site_config(website_name).get('incremental')
+    if incremental is None:
+        return None
+
+    if not incremental.get('s3_bucket'):
+        raise Exception(f'Incremental crawling of {website_name} needs an s3_bucket in mapping.json')
+
+    return CrawlState(website_name, **incremental)
+
+
+def get_output_hook(website_name: str):
+    """
+    :param website_name: key of the website in mapping.json
+    :return: Returns the S3OutputHook the website's output is uploaded with, or None if it is only kept locally.
+    """
+    output = get_site_config(website_name).get('output')
+    if output is None:
+        return None
+
+    # Only needed with S3 output, which also needs the Amazon provider installed.
+    from hooks.s3_hook import S3OutputHook
+
+    return S3OutputHook(**output)
+
+
+def get_crawling_strategy(website_name: str, **kwargs):
+    file_name = get_site_config(website_name)['module']
 
     try:
         module = importlib.import_module(f'scripts.crawler.{file_name}')
@@ -19,13 +119,18 @@ def get_crawling_strategy(website_name: str):
     except AttributeError:
         crawling_strategy = None
 
-    return crawling_strategy()
+    if 'downloader' not in kwargs:
+        kwargs['downloader'] = get_downloader(website_name)
 
+    if 'document_store' not in kwargs:
+        kwargs['document_store'] = get_document_store(website_name)
+
+    return crawling_strategy(**kwargs)
 
-def get_parsing_strategy(website_name: str):
-    with open(mapping_file_path, "r") as file:
-        mapping = json.load(file)
-        file_name = mapping[website_name]
+
+def get_parsing_strategy(website_name: str, **kwargs):
+    site_config = get_site_config(website_name)
+    file_name = site_config['module']
 
     try:
         module = importlib.import_module(f'scripts.parser.{file_name}')
@@ -35,4 +140,26 @@ def get_parsing_strategy(website_name: str):
     except AttributeError:
         parsing_strategy = None
 
-    return parsing_strategy()
+    if 'document_store' not in kwargs:
+        kwargs['document_store'] = get_document_store(website_name)
+
+    parser = parsing_strategy(**kwargs)
+    if site_config.get('parse_workers'):
+        parser.parse_workers = site_config['parse_workers']
+
+    return parser
+
+
+def reparse_raw_data(website_name: str, raw_file_name: str, parsed_file_name: str, workers: int = 1) -> int:
+    """
+    :param website_name: key of the website in mapping.json
+    :param raw_file_name: raw data file written by RawDataStore.dump()
+    :param parsed_file_name: name of the CSV to write
+    :param workers: number of processes parsing the records
+    :return: Returns the number of records written. Raw records are streamed from disk through the parser into
+    the CSV, so a full reparse of historical data runs in constant memory.
+    """
+    parser = get_parsing_strategy(website_name)
+    parsed_records = parser.parse_stream(RawDataStore().load(raw_file_name), workers=workers)
+
+    return CsvWriter().write_stream(parsed_records, parsed_file_name, columns=parser.columns)
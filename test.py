@@ -1,10 +1,13 @@
+from plugins.scripts.file_handler.document_store import DocumentStore
 from plugins.scripts.utils.strategy_utils import get_parsing_strategy, get_crawling_strategy
 
 if __name__ == '__main__':
     website_name = 'ambervalley.gov.uk'
 
-    crawler = get_crawling_strategy(website_name=website_name)
-    parser = get_parsing_strategy(website_name=website_name)
+    # Crawling and parsing in one process, the documents can stay on the local disk.
+    document_store = DocumentStore()
+    crawler = get_crawling_strategy(website_name=website_name, document_store=document_store)
+    parser = get_parsing_strategy(website_name=website_name, document_store=document_store)
 
     application_sources = crawler.get_sources(months_ago=1)
     raw_data = crawler.crawl(reference_numbers=application_sources)
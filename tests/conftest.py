@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Airflow puts plugins/ on the path, so the modules import each other as scripts.*, hooks.* and backends.*.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins'))
@@ -0,0 +1,115 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs
+
+import pytest
+
+from scripts.crawler.ambervalley_gov_uk import AmbervalleyGovUkCrawlingStrategy
+
+day = timedelta(days=1)
+
+
+class FakeSearch:
+    """
+    Stands in for the crawler's download(), answering each date window search with the given function of its
+    start and end dates and recording the windows searched.
+    """
+    def __init__(self, get_results):
+        self.get_results = get_results
+        self.windows = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url, timeout=None, headers=None, cookies=None, data=None):
+        form = parse_qs(data, keep_blank_values=True)
+        window = (datetime.strptime(form['fromDate'][0], '%d/%b/%Y'),
+                  datetime.strptime(form['toDate'][0], '%d/%b/%Y'))
+        with self._lock:
+            self.windows.append(window)
+
+        return json.dumps([{'refVal': reference_number} for reference_number in self.get_results(*window)])
+
+
+def get_crawler(get_results, max_window_days: int = 10, max_window_results: int = 1000):
+    crawler = AmbervalleyGovUkCrawlingStrategy(downloader=object(), document_store=object())
+    crawler.max_window_days = max_window_days
+    crawler.max_window_results = max_window_results
+    crawler.download = FakeSearch(get_results)
+
+    return crawler
+
+
+def daily_results(window_start: datetime, window_end: datetime) -> list:
+    return [f'AVA/{date:%Y%m%d}' for date in (window_start + day * offset
+                                              for offset in range((window_end - window_start).days + 1))]
+
+
+@pytest.mark.parametrize('days', [1, 9, 10, 11, 30, 45, 181])
+def test_windows_are_contiguous_and_do_not_overlap(days):
+    crawler = get_crawler(daily_results)
+    date_start = datetime(2024, 1, 1)
+    date_end = date_start + day * (days - 1)
+
+    date_windows = crawler._get_date_windows(date_start, date_end)
+
+    assert date_windows[0][0] == date_start and date_windows[-1][1] == date_end
+    for (_, previous_end), (window_start, _) in zip(date_windows, date_windows[1:]):
+        assert window_start == previous_end + day
+    assert all(0 <= (window_end - window_start).days < crawler.max_window_days
+               for window_start, window_end in date_windows)
+
+    reference_numbers = crawler._search_date_windows(date_windows)
+    assert reference_numbers == daily_results(date_start, date_end)
+    assert sorted(crawler.download.windows) == date_windows
+
+
+def test_failing_window_is_bisected_down_to_a_single_day_then_raises():
+    failing_day = datetime(2024, 1, 7)
+
+    def get_results(window_start, window_end):
+        if window_start <= failing_day <= window_end:
+            raise Exception('Search timed out')
+        return daily_results(window_start, window_end)
+
+    crawler = get_crawler(get_results)
+
+    with pytest.raises(Exception, match='07/Jan/2024 to 07/Jan/2024'):
+        crawler._search_date_windows(crawler._get_date_windows(datetime(2024, 1, 1), datetime(2024, 1, 10)))
+
+    failing_windows = [window for window in crawler.download.windows if window[0] <= failing_day <= window[1]]
+    assert failing_windows == [(datetime(2024, 1, 1), datetime(2024, 1, 10)),
+                               (datetime(2024, 1, 6), datetime(2024, 1, 10)),
+                               (datetime(2024, 1, 6), datetime(2024, 1, 7)),
+                               (failing_day, failing_day)]
+
+
+def test_full_window_is_bisected_until_it_is_not_full():
+    # Each day has 3 applications, so windows of more than one day come back full and may be truncated.
+    crawler = get_crawler(lambda window_start, window_end: [f'AVA/{window_start:%Y%m%d}/{number}'
+                                                            for number in range(3)], max_window_results=3)
+
+    with pytest.raises(Exception, match='3 results'):
+        crawler._search_date_windows(crawler._get_date_windows(datetime(2024, 1, 1), datetime(2024, 1, 4)))
+
+    assert (datetime(2024, 1, 1), datetime(2024, 1, 1)) in crawler.download.windows
+
+
+def test_split_windows_are_merged_when_no_longer_full():
+    crawler = get_crawler(daily_results, max_window_results=3)
+
+    reference_numbers = crawler._search_date_windows(
+        crawler._get_date_windows(datetime(2024, 1, 1), datetime(2024, 1, 4)))
+
+    assert reference_numbers == daily_results(datetime(2024, 1, 1), datetime(2024, 1, 4))
+    assert (datetime(2024, 1, 1), datetime(2024, 1, 4)) in crawler.download.windows
+
+
+def test_results_are_deduplicated_by_reference_number():
+    # Applications revalidated on a later date are listed by every window they fall in.
+    crawler = get_crawler(lambda window_start, window_end: ['AVA/2024/0001', f'AVA/{window_start:%Y%m%d}'],
+                          max_window_days=2)
+
+    reference_numbers = crawler._search_date_windows(
+        crawler._get_date_windows(datetime(2024, 1, 1), datetime(2024, 1, 6)))
+
+    assert reference_numbers == ['AVA/2024/0001', 'AVA/20240101', 'AVA/20240103', 'AVA/20240105']
@@ -0,0 +1,23 @@
+from scripts.file_handler.document_store import DocumentStore
+from scripts.parser.ambervalley_gov_uk import AmbervalleyGovUkParsingStrategy
+from scripts.parser.defaults import Defaults
+from scripts.parser.document_extractor import DocumentTextExtractor
+
+
+def test_records_whose_document_cannot_be_opened_are_kept(tmp_path):
+    # The document was saved to the local disk of another worker, so this worker's store does not have it.
+    parser = AmbervalleyGovUkParsingStrategy(document_store=DocumentStore(str(tmp_path / 'documents')),
+                                             document_extractor=DocumentTextExtractor(
+                                                 AmbervalleyGovUkParsingStrategy.document_patterns,
+                                                 cache_dir=str(tmp_path / 'text')))
+
+    parsed_data = parser.parse({
+        'date_captured': '2024-01-01T000000',
+        'application_details': {'source': 'details', 'data': {'refVal': 'AVA/2024/0001'}},
+        'application_form_document': {'source': 'form', 'document': {'sha256': 'ab' * 32}},
+    })
+
+    assert parsed_data['ref_val'] == 'AVA/2024/0001'
+    assert parsed_data['application_form_document_source'] == 'form'
+    assert parsed_data['easting'] == Defaults.EXTRACTION_ERROR.value
+    assert parsed_data['planning_portal_reference'] == Defaults.EXTRACTION_ERROR.value
@@ -0,0 +1,38 @@
+from scripts.file_handler.crawl_state import CrawlState
+
+
+def get_crawl_state(tmp_path):
+    return CrawlState('example.gov.uk', db_path=str(tmp_path / 'state.db'))
+
+
+def test_full_refresh_is_recorded_once_the_run_succeeds(tmp_path):
+    crawl_state = get_crawl_state(tmp_path)
+    sources = ['a', 'b']
+
+    assert crawl_state.filter_sources(sources) == sources
+    # Nothing is recorded until the run finishes, so another run before then is still a full refresh.
+    assert crawl_state.filter_sources(sources) == sources
+
+    crawl_state.record([('a', {'value': 1}), ('b', {'value': 2})])
+
+    assert crawl_state.filter_sources(sources + ['c']) == ['c']
+
+
+def test_incomplete_full_refresh_is_retried(tmp_path):
+    crawl_state = get_crawl_state(tmp_path)
+    sources = ['a', 'b']
+
+    crawl_state.filter_sources(sources)
+    crawl_state.record([('a', {'value': 1})], complete=False)
+
+    assert crawl_state.filter_sources(sources) == sources
+
+
+def test_failed_crawls_are_left_due(tmp_path):
+    crawl_state = get_crawl_state(tmp_path)
+    sources = ['a', 'b']
+
+    crawl_state.filter_sources(sources)
+    crawl_state.record([('a', {'value': 1}), ('b', None)])
+
+    assert crawl_state.filter_sources(sources) == ['b']
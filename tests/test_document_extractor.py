@@ -0,0 +1,29 @@
+import os
+
+from scripts.parser.defaults import Defaults
+from scripts.parser.document_extractor import DocumentTextExtractor
+
+
+def test_patterns_match_overlapping_text(tmp_path):
+    extractor = DocumentTextExtractor({'planning_portal_reference': r'(PP-\d{7})', 'reference_number': r'PP-(\d+)',
+                                       'easting': r'Easting \(x\) (\d+)'}, cache_dir=str(tmp_path))
+
+    values = extractor.match('Reference PP-1234567 and PP-1234567, then PP-7654321')
+
+    assert values == {'planning_portal_reference': 'PP-1234567 PP-7654321', 'reference_number': '1234567 7654321',
+                      'easting': Defaults.NOT_FOUND.value}
+
+
+def test_least_recently_used_texts_are_evicted(tmp_path):
+    extractor = DocumentTextExtractor({'value': r'(\d+)'}, cache_dir=str(tmp_path), max_cache_bytes=250)
+    for age, sha256 in enumerate(('newest', 'used', 'oldest')):
+        text_path = os.path.join(str(tmp_path), f'{sha256}.txt')
+        with open(text_path, 'w', encoding='utf-8') as text_file:
+            text_file.write('x' * 100)
+        os.utime(text_path, (1000000 - age, 1000000 - age))
+
+    # Reading a cached text marks it as recently used.
+    assert extractor.get_text(None, sha256='used') == 'x' * 100
+    extractor._evict()
+
+    assert sorted(os.listdir(str(tmp_path))) == ['newest.txt', 'used.txt']
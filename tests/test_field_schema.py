@@ -0,0 +1,59 @@
+from scripts.parser.ambervalley_gov_uk import AmbervalleyGovUkParsingStrategy
+from scripts.parser.defaults import Defaults
+from scripts.parser.field_schema import Field, FieldSchema, camel_to_snake_case, clean_whitespace
+from scripts.parser.wandsworth_gov_uk import WandsworthGovUkParsingStrategy
+
+
+def test_apply_fills_missing_declared_columns():
+    schema = FieldSchema({'refVal': Field('ref_val'), 'proposal': Field('proposal', cleaner=clean_whitespace)},
+                         key_formatter=camel_to_snake_case, missing_value='missing')
+
+    parsed_data = schema.apply([('refVal', 'A/1'), ('newField', 'x')])
+
+    assert parsed_data == {'ref_val': 'A/1', 'new_field': 'x', 'proposal': 'missing'}
+
+
+def test_apply_converts_declared_types():
+    schema = FieldSchema({'easting': Field('easting', int), 'reference': Field('reference')})
+
+    assert schema.apply([('easting', '412345'), ('reference', 1234)]) == {'easting': 412345, 'reference': '1234'}
+    assert schema.apply([('easting', 'unknown')])['easting'] is None
+
+
+def test_apply_keeps_undeclared_values_as_they_are():
+    schema = FieldSchema(cleaner=clean_whitespace)
+
+    assert schema.apply([('count', 3), ('text', 'a\nb')]) == {'count': 3, 'text': 'a b'}
+
+
+def test_ambervalley_records_get_every_column():
+    parser = AmbervalleyGovUkParsingStrategy(document_store=object(), document_extractor=object())
+    full_record = parser.parse({'date_captured': '2024-01-01T000000', 'application_details': {
+        'source': 'details', 'data': {'refVal': 'AVA/2024/0001', 'proposal': 'Two\nstorey extension'}}})
+    empty_record = parser.parse({'date_captured': '2024-01-01T000000', 'application_details': {
+        'source': 'details', 'data': None}})
+
+    schema_columns = AmbervalleyGovUkParsingStrategy.application_details_schema.columns
+    assert set(schema_columns) <= set(full_record) and set(schema_columns) <= set(empty_record)
+    assert full_record['ref_val'] == 'AVA/2024/0001'
+    assert full_record['proposal'] == 'Two storey extension'
+    assert full_record['decision'] is None
+
+
+def test_wandsworth_records_get_every_column():
+    parser = WandsworthGovUkParsingStrategy(document_store=object(), document_extractor=object())
+    main_page = ('<div><span>Application Number</span>2024/0001</div>'
+                 '<div><span>Proposal</span>Rear\n  extension</div>')
+    dates_page = '<div><span>Received</span>01/01/2024</div>'
+
+    record = parser.parse({'source': 'main', 'main_page_data': main_page, 'dates_page_data': dates_page})
+    record_without_dates = parser.parse({'source': 'main', 'main_page_data': main_page})
+
+    for parsed_data in (record, record_without_dates):
+        assert set(WandsworthGovUkParsingStrategy.main_page_schema.columns) <= set(parsed_data)
+        assert set(WandsworthGovUkParsingStrategy.dates_page_schema.columns) <= set(parsed_data)
+        assert parsed_data['ApplicationNumber'] == '2024/0001'
+        assert parsed_data['SiteAddress'] == Defaults.NOT_FOUND.value
+    assert record['Proposal'] == 'Rear   extension'
+    assert record['received'] == '01/01/2024'
+    assert record_without_dates['received'] == Defaults.NOT_FOUND.value
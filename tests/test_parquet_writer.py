@@ -0,0 +1,43 @@
+import pyarrow.parquet as pq
+
+from scripts.file_handler.parquet_writer import ParquetWriter
+from scripts.parser.ambervalley_gov_uk import AmbervalleyGovUkParsingStrategy
+
+
+def test_partitioned_dataset_reads_back(tmp_path):
+    writer = ParquetWriter(str(tmp_path), row_group_size=2)
+    columns = AmbervalleyGovUkParsingStrategy.columns
+    column_types = AmbervalleyGovUkParsingStrategy.column_types
+    first_day = [{'date_captured': '2024-01-01T090000', 'ref_val': f'AVA/2024/{number:04d}', 'easting': '412345'}
+                 for number in range(3)]
+    second_day = [{'date_captured': '2024-01-02T090000', 'ref_val': 'AVA/2024/0003', 'new_field': 'x'}, None]
+
+    assert writer.write_stream(first_day, 'ambervalley.gov.uk', '2024-01-01', 'part', columns, column_types) == 3
+    assert writer.write_stream(second_day, 'ambervalley.gov.uk', '2024-01-02', 'part', columns, column_types) == 1
+
+    table = pq.read_table(str(tmp_path))
+
+    assert table.num_rows == 4
+    assert {'council', 'capture_date', 'date_captured', 'extra_fields'} <= set(table.column_names)
+    rows = sorted(table.to_pylist(), key=lambda row: row['ref_val'])
+    assert rows[0]['date_captured'] == '2024-01-01T090000'
+    assert rows[0]['easting'] == '412345'
+    assert rows[0]['extra_fields'] is None
+    assert rows[3]['council'] == 'ambervalley.gov.uk'
+    assert str(rows[3]['capture_date']) == '2024-01-02'
+    assert rows[3]['decision'] is None
+    assert rows[3]['extra_fields'] == [('new_field', 'x')]
+
+
+def test_parts_share_the_declared_schema(tmp_path):
+    writer = ParquetWriter(str(tmp_path))
+    columns = ('reference', 'easting')
+    column_types = {'easting': int}
+
+    writer.write_stream([{'reference': 'A', 'easting': '1'}], 'council', '2024-01-01', 'first', columns, column_types)
+    writer.write_stream([{'reference': 'B', 'other': 'y'}], 'council', '2024-01-01', 'second', columns, column_types)
+
+    first_schema = pq.read_schema(writer.get_file_path('council', '2024-01-01', 'first'))
+    second_schema = pq.read_schema(writer.get_file_path('council', '2024-01-01', 'second'))
+    assert first_schema == second_schema
+    assert first_schema.names == ['reference', 'easting', 'extra_fields']
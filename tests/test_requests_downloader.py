@@ -0,0 +1,52 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.downloader.default_downloader import DefaultDownloader
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'%PDF-1.4 document' if self.path.endswith('.pdf') else b'<html></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf' if self.path.endswith('.pdf') else 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_documents_are_streamed_to_file_when_the_content_type_matches(base_url):
+    downloader = DefaultDownloader()
+    document_file = io.BytesIO()
+
+    assert downloader.download_to_file(f'{base_url}/form.pdf', document_file, content_type='pdf') is not None
+    assert document_file.getvalue() == b'%PDF-1.4 document'
+    assert downloader.download_to_file(f'{base_url}/page', io.BytesIO(), content_type='pdf') is None
+    assert downloader.get(f'{base_url}/page').text == '<html></html>'
+
+
+def test_new_sessions_keep_the_session_setup():
+    downloader = DefaultDownloader()
+    downloader.requester.proxies = {'https': 'http://proxy:8011/'}
+
+    session_downloader = downloader.new_session()
+
+    assert session_downloader.requester is not downloader.requester
+    assert session_downloader.requester.verify is False
+    assert session_downloader.requester.proxies == {'https': 'http://proxy:8011/'}
+    assert session_downloader.retry_policy is downloader.retry_policy
@@ -0,0 +1,201 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+from requests.exceptions import ConnectionError, HTTPError
+
+from scripts.downloader import retry_policy
+from scripts.downloader.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+url = 'https://planning.example.gov.uk/search'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry_policy.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(retry_policy.time, 'sleep', clock.sleep)
+    # Circuit breakers are shared per host by the whole process, so every test starts without any.
+    monkeypatch.setattr(retry_policy, '_circuit_breakers', {})
+
+    return clock
+
+
+def get_response(status_code: int, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+
+    return response
+
+
+def http_error(status_code: int, headers: dict = None) -> HTTPError:
+    return HTTPError(f'{status_code} error', response=get_response(status_code, headers))
+
+
+def failing(*exceptions):
+    # Raises each exception in turn, then returns 'ok'.
+    remaining = list(exceptions)
+    calls = []
+
+    def function():
+        calls.append(None)
+        if remaining:
+            raise remaining.pop(0)
+        return 'ok'
+
+    function.calls = calls
+    return function
+
+
+def test_circuit_opens_after_consecutive_failures_and_recovers_half_open(clock):
+    circuit_breaker = CircuitBreaker('host', failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        circuit_breaker.before_request()
+        circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_request()
+
+    clock.now += 60
+    circuit_breaker.before_request()
+    assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial request is let through while half open.
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_request()
+
+    circuit_breaker.record_success()
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+    assert circuit_breaker.failure_count == 0
+    circuit_breaker.before_request()
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    circuit_breaker = CircuitBreaker('host', failure_threshold=1, reset_timeout=60)
+    circuit_breaker.before_request()
+    circuit_breaker.record_failure()
+
+    clock.now += 60
+    circuit_breaker.before_request()
+    circuit_breaker.record_failure()
+
+    assert circuit_breaker.state == CircuitBreaker.OPEN
+    assert circuit_breaker.opened_at == clock.now
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.before_request()
+
+
+def test_retry_after_seconds_and_http_date():
+    assert RetryPolicy.get_retry_after(get_response(429, {'Retry-After': '7'})) == 7.0
+    assert RetryPolicy.get_retry_after(get_response(503, {'Retry-After': '-3'})) == 0.0
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    retry_after = RetryPolicy.get_retry_after(get_response(503, {'Retry-After': format_datetime(retry_at, True)}))
+    assert 115 <= retry_after <= 120
+
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1), True)
+    assert RetryPolicy.get_retry_after(get_response(429, {'Retry-After': past})) == 0.0
+
+
+def test_retry_after_is_ignored_when_unusable():
+    assert RetryPolicy.get_retry_after(None) is None
+    assert RetryPolicy.get_retry_after(get_response(429)) is None
+    assert RetryPolicy.get_retry_after(get_response(429, {'Retry-After': 'soon'})) is None
+    # Only 429 and 503 responses are asked to wait.
+    assert RetryPolicy.get_retry_after(get_response(500, {'Retry-After': '7'})) is None
+
+
+def test_backoff_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+
+    assert all(0 <= policy.get_delay(attempt) <= min(30.0, 2 ** (attempt - 1)) for attempt in range(1, 20)
+               for _ in range(50))
+
+
+def test_backoff_is_full_jitter(monkeypatch):
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+    bounds = []
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: bounds.append((low, high)) or high)
+
+    delays = [policy.get_delay(attempt) for attempt in range(1, 8)]
+
+    assert bounds == [(0, 1.0), (0, 2.0), (0, 4.0), (0, 8.0), (0, 16.0), (0, 30.0), (0, 30.0)]
+    assert delays == [high for _, high in bounds]
+
+
+def test_retryable_errors_are_retried_with_retry_after_taking_precedence(clock):
+    function = failing(ConnectionError('reset'), http_error(503, {'Retry-After': '5'}))
+    retries = []
+
+    result = RetryPolicy(base_delay=0.0).call(url, function, on_retry=lambda *args: retries.append(args[1]))
+
+    assert result == 'ok'
+    assert len(function.calls) == 3
+    assert clock.sleeps == [0.0, 5.0]
+    assert retries == [1, 2]
+
+
+def test_gives_up_after_max_attempts(clock):
+    function = failing(*[http_error(500) for _ in range(5)])
+
+    with pytest.raises(HTTPError):
+        RetryPolicy(max_attempts=3, base_delay=0.0, failure_threshold=10).call(url, function)
+
+    assert len(function.calls) == 3
+
+
+def test_gives_up_when_retry_after_is_too_long(clock):
+    function = failing(http_error(429, {'Retry-After': '600'}))
+
+    with pytest.raises(HTTPError):
+        RetryPolicy(max_retry_after=120).call(url, function)
+
+    assert clock.sleeps == []
+
+
+def test_non_retryable_errors_leave_the_circuit_untouched(clock):
+    policy = RetryPolicy(base_delay=0.0, failure_threshold=2)
+    circuit_breaker = retry_policy.get_circuit_breaker(url, policy.failure_threshold, policy.reset_timeout)
+
+    for _ in range(5):
+        with pytest.raises(HTTPError):
+            policy.call(url, failing(http_error(404)))
+
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+    assert circuit_breaker.failure_count == 0
+
+    # A 404 on the half open trial releases it without closing or reopening the circuit.
+    circuit_breaker.record_failure()
+    circuit_breaker.record_failure()
+    clock.now += policy.reset_timeout
+    with pytest.raises(HTTPError):
+        policy.call(url, failing(http_error(404)))
+
+    assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.call(url, failing()) == 'ok'
+    assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_fails_fast(clock):
+    policy = RetryPolicy(base_delay=0.0, max_attempts=2, failure_threshold=2)
+    function = failing(*[ConnectionError('reset') for _ in range(2)])
+
+    with pytest.raises(ConnectionError):
+        policy.call(url, function)
+    with pytest.raises(CircuitOpenError):
+        policy.call(url, failing())
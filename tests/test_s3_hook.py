@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+pytest.importorskip('airflow.providers.amazon.aws.hooks.s3')
+
+from hooks.s3_hook import S3OutputHook  # noqa: E402
+
+bucket_name = 'output-bucket'
+part_size = 5 * 1024 * 1024  # S3's smallest multipart part
+
+
+@pytest.fixture
+def s3_hook(monkeypatch):
+    monkeypatch.setenv('AIRFLOW_CONN_AWS_DEFAULT', 'aws://')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with moto.mock_aws():
+        boto3.client('s3').create_bucket(Bucket=bucket_name)
+        yield S3OutputHook(bucket_name, transfer_config_args=dict(multipart_threshold=part_size,
+                                                                  multipart_chunksize=part_size))
+
+
+def write_file(file_path, content: bytes):
+    with open(file_path, 'wb') as file:
+        file.write(content)
+
+    return str(file_path)
+
+
+def test_large_files_are_uploaded_in_parts(s3_hook, tmp_path):
+    file_path = write_file(tmp_path / 'part.parquet', os.urandom(2 * part_size + 1))
+
+    assert s3_hook.upload_if_changed(file_path, 'output/parquet/part.parquet')
+
+    head = s3_hook.head_object('output/parquet/part.parquet', bucket_name=bucket_name)
+    assert head['ETag'].strip('"').endswith('-3')
+    assert head['ContentLength'] == 2 * part_size + 1
+    assert head['Metadata'][S3OutputHook.checksum_metadata] == S3OutputHook._get_sha256(file_path)
+
+
+def test_unchanged_files_are_skipped(s3_hook, tmp_path):
+    file_path = write_file(tmp_path / 'data.csv', b'reference\nA\n')
+
+    assert s3_hook.upload_if_changed(file_path, 'output/csv/data.csv')
+    assert not s3_hook.upload_if_changed(file_path, 'output/csv/data.csv')
+
+
+def test_changed_files_are_uploaded_again(s3_hook, tmp_path):
+    file_path = write_file(tmp_path / 'data.csv', b'reference\nA\n')
+    assert s3_hook.upload_if_changed(file_path, 'output/csv/data.csv')
+
+    write_file(file_path, b'reference\nA\nB\n')
+
+    assert s3_hook.upload_if_changed(file_path, 'output/csv/data.csv')
+    assert s3_hook.read_key('output/csv/data.csv', bucket_name=bucket_name) == 'reference\nA\nB\n'
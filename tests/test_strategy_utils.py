@@ -0,0 +1,10 @@
+import pytest
+
+from scripts.utils import strategy_utils
+
+
+def test_document_store_needs_an_s3_bucket(monkeypatch):
+    monkeypatch.setattr(strategy_utils, 'get_site_config', lambda website_name: {'module': 'ambervalley_gov_uk'})
+
+    with pytest.raises(Exception, match='s3_bucket'):
+        strategy_utils.get_document_store('ambervalley.gov.uk')
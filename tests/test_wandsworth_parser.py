@@ -0,0 +1,48 @@
+from scripts.file_handler.document_store import DocumentStore
+from scripts.parser.defaults import Defaults
+from scripts.parser.document_extractor import DocumentTextExtractor
+from scripts.parser.wandsworth_gov_uk import WandsworthGovUkParsingStrategy
+
+main_page = '<div><span>Application Number</span>2024/0001</div><div><span>Proposal</span>Rear extension</div>'
+dates_page = '<div><span>Received</span>01/01/2024</div>'
+document_values = {'easting': '512345', 'northing': '174321', 'planning_portal_reference': 'PP-1234567'}
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.documents = []
+
+    def extract(self, document_stream, sha256: str = None) -> dict:
+        with document_stream:
+            self.documents.append((document_stream.read(), sha256))
+
+        return dict(document_values)
+
+
+def test_records_from_before_the_document_store_are_parsed():
+    # Records crawled before documents were streamed to the store carry the PDF bytes under the same key.
+    document_extractor = FakeExtractor()
+    parser = WandsworthGovUkParsingStrategy(document_store=object(), document_extractor=document_extractor)
+
+    parsed_data = parser.parse({'main_page_data': main_page, 'dates_page_data': dates_page,
+                                'application_form_document_data': b'%PDF-1.4 application form',
+                                'source': 'main', 'date_captured': '2024-01-01T000000'})
+
+    assert document_extractor.documents == [(b'%PDF-1.4 application form', None)]
+    assert parsed_data['ApplicationNumber'] == '2024/0001'
+    assert parsed_data['received'] == '01/01/2024'
+    assert parsed_data['planning_portal_reference'] == 'PP-1234567'
+
+
+def test_records_whose_document_cannot_be_opened_are_kept(tmp_path):
+    # The document was saved to the local disk of another worker, so this worker's store does not have it.
+    parser = WandsworthGovUkParsingStrategy(document_store=DocumentStore(str(tmp_path / 'documents')),
+                                            document_extractor=DocumentTextExtractor(
+                                                WandsworthGovUkParsingStrategy.document_patterns,
+                                                cache_dir=str(tmp_path / 'text')))
+
+    parsed_data = parser.parse({'main_page_data': main_page, 'application_form_document_data': {'sha256': 'ab' * 32},
+                                'source': 'main'})
+
+    assert parsed_data['ApplicationNumber'] == '2024/0001'
+    assert parsed_data['planning_portal_reference'] == Defaults.EXTRACTION_ERROR.value